@@ -0,0 +1,313 @@
+import argparse
+import json
+import sqlite3
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+# Normalized SQLite copy of the parsed archive, one row per post plus child tables
+# for the list fields that get queried. Fields that are only ever displayed stay
+# in posts.data as JSON.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    thread_id TEXT PRIMARY KEY,
+    channel_id TEXT,
+    category_name TEXT,
+    title TEXT,
+    slug TEXT,
+    parsed_at TEXT,
+    version_base TEXT,
+    version_modifications TEXT,
+    lag_cpu TEXT,
+    lag_has_lithium INTEGER,
+    lag_version TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS post_tags (
+    thread_id TEXT NOT NULL REFERENCES posts(thread_id) ON DELETE CASCADE,
+    tag_id TEXT,
+    tag_name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS contributors (
+    thread_id TEXT NOT NULL REFERENCES posts(thread_id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    user_id TEXT,
+    name TEXT,
+    channel_link TEXT,
+    contribution TEXT,
+    contribution_link TEXT
+);
+CREATE TABLE IF NOT EXISTS rates (
+    rate_id INTEGER PRIMARY KEY,
+    thread_id TEXT NOT NULL REFERENCES posts(thread_id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    variants TEXT NOT NULL,
+    version TEXT,
+    item_type TEXT,
+    conditions TEXT,
+    amount REAL,
+    interval TEXT,
+    note TEXT
+);
+CREATE TABLE IF NOT EXISTS rate_items (
+    rate_id INTEGER NOT NULL REFERENCES rates(rate_id) ON DELETE CASCADE,
+    thread_id TEXT NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lag_entries (
+    thread_id TEXT NOT NULL REFERENCES posts(thread_id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    conditions TEXT NOT NULL,
+    lag REAL
+);
+CREATE TABLE IF NOT EXISTS files (
+    thread_id TEXT NOT NULL REFERENCES posts(thread_id) ON DELETE CASCADE,
+    category TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    name TEXT,
+    url TEXT,
+    note TEXT
+);
+CREATE INDEX IF NOT EXISTS posts_channel ON posts(channel_id);
+CREATE INDEX IF NOT EXISTS post_tags_thread ON post_tags(thread_id);
+CREATE INDEX IF NOT EXISTS post_tags_name ON post_tags(tag_name);
+CREATE INDEX IF NOT EXISTS contributors_thread ON contributors(thread_id);
+CREATE INDEX IF NOT EXISTS contributors_user ON contributors(user_id, role);
+CREATE INDEX IF NOT EXISTS rates_thread ON rates(thread_id);
+CREATE INDEX IF NOT EXISTS rate_items_rate ON rate_items(rate_id);
+CREATE INDEX IF NOT EXISTS rate_items_name ON rate_items(name);
+CREATE INDEX IF NOT EXISTS lag_entries_thread ON lag_entries(thread_id);
+CREATE INDEX IF NOT EXISTS files_thread ON files(thread_id);
+"""
+
+
+def connect(path: str) -> sqlite3.Connection:
+    # The bot hands the connection to worker threads, callers serialise access
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def split_document(document: dict) -> tuple[dict, dict]:
+    # (metadata, post) for each parsed file layout: the bot writer ("post_data"),
+    # the edit modal ("variants") and the parser.py runner (flat)
+    if "post_data" in document:
+        metadata = document
+        post = document["post_data"]
+    elif "variants" in document:
+        metadata = {
+            "thread_id": document.get("thread_id"),
+            "channel_id": document.get("channel_id"),
+            "title": document.get("thread_name"),
+            "tags": document.get("tags", []),
+        }
+        post = document["variants"]
+    else:
+        metadata = {
+            "thread_id": document.get("id"),
+            "channel_id": document.get("channel_id"),
+            "title": document.get("title"),
+            "slug": document.get("slug"),
+            "tags": document.get("tags", []),
+        }
+        post = document
+    return metadata, post
+
+
+def iter_files(
+    nodes: list[dict], category: str, folder: str = ""
+) -> Iterator[tuple[str, str, str, str, str]]:
+    # Flattens the file tree, folders become a "/" separated path
+    for node in nodes:
+        if node.get("type") == "folder":
+            child_folder = f"{folder}/{node['name']}" if folder else node["name"]
+            yield from iter_files(node.get("children", []), category, child_folder)
+        else:
+            yield category, folder, node.get("name"), node.get("url"), node.get("note")
+
+
+def upsert_post(connection: sqlite3.Connection, document: dict):
+    """Replaces every row of the post in one transaction."""
+    metadata, post = split_document(document)
+    thread_id = str(metadata["thread_id"])
+    versions = post.get("versions") or {}
+    lag_info = post.get("lag_info") or {}
+    environment = lag_info.get("environment") or {}
+
+    with connection:
+        # Child rows go with the post through ON DELETE CASCADE
+        connection.execute("DELETE FROM posts WHERE thread_id = ?", (thread_id,))
+        connection.execute(
+            "INSERT INTO posts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                thread_id,
+                str(metadata.get("channel_id") or ""),
+                metadata.get("category_name"),
+                metadata.get("title"),
+                metadata.get("slug"),
+                metadata.get("parsed_at"),
+                versions.get("base"),
+                versions.get("modifications"),
+                environment.get("cpu"),
+                int(bool(environment.get("has_lithium"))) if environment else None,
+                environment.get("version"),
+                json.dumps(post),
+            ),
+        )
+        connection.executemany(
+            "INSERT INTO post_tags VALUES (?, ?, ?)",
+            (
+                (
+                    (thread_id, str(tag["id"]), tag["name"])
+                    if isinstance(tag, dict)
+                    else (thread_id, None, tag)
+                )
+                for tag in metadata.get("tags") or []
+            ),
+        )
+        connection.executemany(
+            "INSERT INTO contributors VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    thread_id,
+                    role,
+                    position,
+                    contributor.get("id") or None,
+                    contributor.get("name"),
+                    contributor.get("channel_link"),
+                    contributor.get("contribution"),
+                    contributor.get("contribution_link"),
+                )
+                for role, key in (("designer", "designers"), ("credit", "credits"))
+                for position, contributor in enumerate(post.get(key) or [])
+            ),
+        )
+        rates = post.get("rates") or {}
+        for kind in ("drops", "consumption"):
+            for position, rate in enumerate(rates.get(kind) or []):
+                items = rate.get("items") or {}
+                cursor = connection.execute(
+                    "INSERT INTO rates (thread_id, kind, position, variants, version,"
+                    " item_type, conditions, amount, interval, note)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        thread_id,
+                        kind,
+                        position,
+                        json.dumps(rate.get("variants") or []),
+                        rate.get("version"),
+                        items.get("type"),
+                        rate.get("conditions"),
+                        rate.get("amount"),
+                        rate.get("interval"),
+                        rate.get("note"),
+                    ),
+                )
+                connection.executemany(
+                    "INSERT INTO rate_items VALUES (?, ?, ?)",
+                    (
+                        (cursor.lastrowid, thread_id, name)
+                        for name in items.get("names") or []
+                    ),
+                )
+        connection.executemany(
+            "INSERT INTO lag_entries VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    thread_id,
+                    kind,
+                    position,
+                    json.dumps(entry.get("conditions") or []),
+                    entry.get("lag"),
+                )
+                for kind in ("idle", "active")
+                for position, entry in enumerate(lag_info.get(kind) or [])
+            ),
+        )
+        files = post.get("files") or {}
+        connection.executemany(
+            "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (thread_id, *file_row)
+                for category in ("schematics", "world_downloads", "images")
+                for file_row in iter_files(files.get(category) or [], category)
+            ),
+        )
+
+
+def delete_post(connection: sqlite3.Connection, thread_id: int | str):
+    with connection:
+        connection.execute("DELETE FROM posts WHERE thread_id = ?", (str(thread_id),))
+
+
+def prune_posts(connection: sqlite3.Connection, keep_ids: Iterable[int | str]) -> int:
+    # Drops posts whose thread is not in keep_ids, returns how many were removed
+    keep = {str(thread_id) for thread_id in keep_ids}
+    stale = [
+        (thread_id,)
+        for (thread_id,) in connection.execute("SELECT thread_id FROM posts")
+        if thread_id not in keep
+    ]
+    with connection:
+        connection.executemany("DELETE FROM posts WHERE thread_id = ?", stale)
+    return len(stale)
+
+
+def post_count(connection: sqlite3.Connection) -> int:
+    return connection.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+
+
+def export_documents(connection: sqlite3.Connection, documents: Iterable[dict]) -> int:
+    exported = 0
+    for document in documents:
+        upsert_post(connection, document)
+        exported += 1
+    return exported
+
+
+def export_directory(
+    connection: sqlite3.Connection, directory: Path
+) -> tuple[int, int]:
+    """Loads every <thread_id>.json of a parsed output directory.
+
+    Returns (exported, failed).
+    """
+    exported = failed = 0
+    for path in sorted(directory.glob("*.json")):
+        try:
+            with open(path, encoding="utf-8") as file:
+                upsert_post(connection, json.load(file))
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"{path}: {type(e).__name__}: {e}")
+            failed += 1
+            continue
+        exported += 1
+    prune_posts(connection, (path.stem for path in directory.glob("*.json")))
+    return exported, failed
+
+
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(
+        description="Export a directory of parsed posts into an SQLite database."
+    )
+    argument_parser.add_argument(
+        "--input",
+        default="parsed",
+        help="Directory of <thread_id>.json files (default: parsed)",
+    )
+    argument_parser.add_argument(
+        "--output",
+        default="archive.db",
+        help="SQLite database to create or update (default: archive.db)",
+    )
+    args = argument_parser.parse_args()
+
+    connection = connect(args.output)
+    exported, failed = export_directory(connection, Path(args.input))
+    connection.close()
+    print(f"Exported {exported} posts to {args.output}, {failed} failed")
@@ -6,7 +6,7 @@ from discord.utils import snowflake_time
 from discord.ext import commands
 from discord import app_commands
 from constants import HIGHER_ROLES, HELP_FORUM, STAFF_ROLES, ALLOWED_FORUMS, NON_ARCHIVE_CATEGORIES, FORUMS, FAQ_CHANNEL, PENDING_TAGS, INACTIVE_TAG, UNSOLVED_TAG, SUBMISSIONS_CHANNEL, RESOLVED_TAGS, LOG_CHANNEL
-from cogs.utility import TagSelectView
+from cogs.utility import TagSelectView, ProgressReporter
 
 class Management(commands.Cog):
     def __init__(self, bot: commands.Bot):
@@ -21,44 +21,50 @@ class Management(commands.Cog):
     
     # Open all archive threads
     async def open_all_archived(self, run_channel: discord.TextChannel):
-        await run_channel.send("Running open archived loop")
-        opened_posts = 0
-        guild = run_channel.guild
-        # Archive channels
-        for channel in guild.channels:
-            if isinstance(channel, discord.ForumChannel) and (channel.category_id not in NON_ARCHIVE_CATEGORIES):
-                async for thread in channel.archived_threads(limit=None):
-                    if thread.archived and not thread.flags.pinned:
+        async with ProgressReporter(run_channel, "Open archived loop") as progress:
+            opened_posts = 0
+            guild = run_channel.guild
+            # Archive channels
+            for channel in guild.channels:
+                if isinstance(channel, discord.ForumChannel) and (channel.category_id not in NON_ARCHIVE_CATEGORIES):
+                    async for thread in progress.paged(channel.archived_threads(limit=None)):
+                        progress.advance()
+                        if thread.archived and not thread.flags.pinned:
+                            try:
+                                await thread.edit(archived=False)
+                                progress.api_calls += 1
+                                opened_posts += 1
+                                await asyncio.sleep(0.5)
+                            except discord.Forbidden:
+                                await run_channel.send(f"Error: Bot does not have manage threads permission to edit <#{thread.id}> in <#{channel.id}>")
+                                return
+            faq_channel = self.bot.get_channel(FAQ_CHANNEL)
+            # FAQ channel
+            async for thread in progress.paged(faq_channel.archived_threads(limit=None)):
+                progress.advance()
+                if thread.archived and not thread.flags.pinned:
+                    try:
+                        await thread.edit(archived=False)
+                        progress.api_calls += 1
+                        opened_posts += 1
+                        await asyncio.sleep(0.5)
+                    except discord.Forbidden:
+                        await run_channel.send(f"Error: Bot does not have manage threads permission to edit <#{thread.id}> in <#{faq_channel.id}>")
+                        return
+            # Submissions, corrections, help
+            for forum in FORUMS:
+                channel = self.bot.get_channel(forum)
+                async for thread in progress.paged(channel.archived_threads(limit=None)):
+                    progress.advance()
+                    if thread.archived and any(tag.id in PENDING_TAGS for tag in thread.applied_tags) and not thread.flags.pinned:
                         try:
                             await thread.edit(archived=False)
+                            progress.api_calls += 1
                             opened_posts += 1
                             await asyncio.sleep(0.5)
                         except discord.Forbidden:
                             await run_channel.send(f"Error: Bot does not have manage threads permission to edit <#{thread.id}> in <#{channel.id}>")
                             return
-        faq_channel = self.bot.get_channel(FAQ_CHANNEL)
-        # FAQ channel
-        async for thread in faq_channel.archived_threads(limit=None):
-            if thread.archived and not thread.flags.pinned:
-                try:
-                    await thread.edit(archived=False)
-                    opened_posts += 1
-                    await asyncio.sleep(0.5)
-                except discord.Forbidden:
-                    await run_channel.send(f"Error: Bot does not have manage threads permission to edit <#{thread.id}> in <#{faq_channel.id}>")
-                    return
-        # Submissions, corrections, help
-        for forum in FORUMS:
-            channel = self.bot.get_channel(forum)
-            async for thread in channel.archived_threads(limit=None):
-                if thread.archived and any(tag.id in PENDING_TAGS for tag in thread.applied_tags) and not thread.flags.pinned:
-                    try:
-                        await thread.edit(archived=False)
-                        opened_posts += 1
-                        await asyncio.sleep(0.5)
-                    except discord.Forbidden:
-                        await run_channel.send(f"Error: Bot does not have manage threads permission to edit <#{thread.id}> in <#{channel.id}>")
-                        return
 
         if opened_posts > 0:
             report = f"**Successfully opened {opened_posts} forum post(s)**"
@@ -67,30 +73,34 @@ class Management(commands.Cog):
             await run_channel.send("No closed forum posts found in the archives")
 
     async def close_all_resolved(self, run_channel: discord.TextChannel):
-        await run_channel.send("Running close resolved loop")
-        guild = run_channel.guild
-        closed_posts = 0
-        post_list = []
-        tags = {'solved', 'rejected', 'archived', 'inactive', 'off-topic'}
+        async with ProgressReporter(run_channel, "Close resolved loop") as progress:
+            guild = run_channel.guild
+            closed_posts = 0
+            post_list = []
+            tags = {'solved', 'rejected', 'archived', 'inactive', 'off-topic'}
+            progress.total = sum(len(channel.threads) for channel in guild.channels if isinstance(channel, discord.ForumChannel))
 
-        for channel in guild.channels:
-            if isinstance(channel, discord.ForumChannel):
-                for thread in channel.threads:
-                    if thread.archived or thread.flags.pinned:
-                        continue
-                    if thread.locked and not thread.archived:
-                        await thread.edit(locked=False)
-                        await thread.edit(archived=True, locked=True)
-                        await asyncio.sleep(0.5)
-                    if any(tag.name.lower() in tags for tag in thread.applied_tags):
-                        try:
-                            await thread.edit(archived=True)
-                            closed_posts += 1
-                            post_list.append(f"*<#{thread.id}>* in <#{channel.id}>")
+            for channel in guild.channels:
+                if isinstance(channel, discord.ForumChannel):
+                    for thread in channel.threads:
+                        progress.advance()
+                        if thread.archived or thread.flags.pinned:
+                            continue
+                        if thread.locked and not thread.archived:
+                            await thread.edit(locked=False)
+                            await thread.edit(archived=True, locked=True)
+                            progress.api_calls += 2
                             await asyncio.sleep(0.5)
-                        except discord.Forbidden:
-                            await run_channel.send(f"Error: Bot does not have manage threads permission in <#{channel.id}>")
-                            break
+                        if any(tag.name.lower() in tags for tag in thread.applied_tags):
+                            try:
+                                await thread.edit(archived=True)
+                                progress.api_calls += 1
+                                closed_posts += 1
+                                post_list.append(f"*<#{thread.id}>* in <#{channel.id}>")
+                                await asyncio.sleep(0.5)
+                            except discord.Forbidden:
+                                await run_channel.send(f"Error: Bot does not have manage threads permission in <#{channel.id}>")
+                                break
             
         if closed_posts > 0:
             report = f"### Successfully closed {closed_posts} forum post(s):\n"
@@ -102,51 +112,59 @@ class Management(commands.Cog):
             await run_channel.send("No open forum posts found that were marked as solved/archived/rejected")
 
     async def mark_inactive(self, run_channel: discord.TextChannel):
-        await run_channel.send("Running mark inactive loop")
-        help_forum = self.bot.get_channel(HELP_FORUM)
-        now = discord.utils.utcnow()
-        inactive_tag = help_forum.get_tag(INACTIVE_TAG)
-        new_tags = []
-        new_tags.append(inactive_tag)
-        count = 0
-        for thread in help_forum.threads:
-            if not any(tag.id == UNSOLVED_TAG for tag in thread.applied_tags):
-                continue
-            if thread.last_message_id:
-                last_activity = snowflake_time(thread.last_message_id)
-            else:
-                last_activity = thread.created_at
-            elapsed_time = now - last_activity
-            if elapsed_time > timedelta(weeks=1):
-                await thread.edit(archived=True, applied_tags=new_tags)
-                count += 1
-                continue
-            if elapsed_time > timedelta(days=3):
-                last_msg = thread.last_message
-                if last_msg is None and thread.last_message_id is not None:
-                    try:
-                        last_msg = await thread.fetch_message(thread.last_message_id)
-                    except discord.NotFound:
-                        pass
-                if last_msg and last_msg.author != self.bot.user:
-                    await thread.send(content=f"{thread.owner.mention} was this help request solved?\nIf so please make sure to mark it as solved using `/tag_selector`")
-        await run_channel.send(content=f"Marked **{count}** help threads as inactive")
-
-    async def lock_submissions(self, run_channel: discord.TextChannel):
-        await run_channel.send("Running lock submissions loop")
-        submissions = self.bot.get_channel(SUBMISSIONS_CHANNEL)
-        count = 0
-        for thread in submissions.threads:
-            if any(tag.id in RESOLVED_TAGS for tag in thread.applied_tags) and not thread.locked:
+        async with ProgressReporter(run_channel, "Mark inactive loop") as progress:
+            help_forum = self.bot.get_channel(HELP_FORUM)
+            now = discord.utils.utcnow()
+            inactive_tag = help_forum.get_tag(INACTIVE_TAG)
+            new_tags = []
+            new_tags.append(inactive_tag)
+            count = 0
+            progress.total = len(help_forum.threads)
+            for thread in help_forum.threads:
+                progress.advance()
+                if not any(tag.id == UNSOLVED_TAG for tag in thread.applied_tags):
+                    continue
                 if thread.last_message_id:
                     last_activity = snowflake_time(thread.last_message_id)
                 else:
                     last_activity = thread.created_at
-                elapsed_time = discord.utils.utcnow() - last_activity
-                if elapsed_time > timedelta(days=1):
-                    await thread.edit(archived=False, locked=True)
-                    await thread.edit(archived=True)
+                elapsed_time = now - last_activity
+                if elapsed_time > timedelta(weeks=1):
+                    await thread.edit(archived=True, applied_tags=new_tags)
+                    progress.api_calls += 1
                     count += 1
+                    continue
+                if elapsed_time > timedelta(days=3):
+                    last_msg = thread.last_message
+                    if last_msg is None and thread.last_message_id is not None:
+                        try:
+                            progress.api_calls += 1
+                            last_msg = await thread.fetch_message(thread.last_message_id)
+                        except discord.NotFound:
+                            pass
+                    if last_msg and last_msg.author != self.bot.user:
+                        await thread.send(content=f"{thread.owner.mention} was this help request solved?\nIf so please make sure to mark it as solved using `/tag_selector`")
+                        progress.api_calls += 1
+        await run_channel.send(content=f"Marked **{count}** help threads as inactive")
+
+    async def lock_submissions(self, run_channel: discord.TextChannel):
+        async with ProgressReporter(run_channel, "Lock submissions loop") as progress:
+            submissions = self.bot.get_channel(SUBMISSIONS_CHANNEL)
+            count = 0
+            progress.total = len(submissions.threads)
+            for thread in submissions.threads:
+                progress.advance()
+                if any(tag.id in RESOLVED_TAGS for tag in thread.applied_tags) and not thread.locked:
+                    if thread.last_message_id:
+                        last_activity = snowflake_time(thread.last_message_id)
+                    else:
+                        last_activity = thread.created_at
+                    elapsed_time = discord.utils.utcnow() - last_activity
+                    if elapsed_time > timedelta(days=1):
+                        await thread.edit(archived=False, locked=True)
+                        await thread.edit(archived=True)
+                        progress.api_calls += 2
+                        count += 1
         await run_channel.send(content=f"Locked {count} Rejected/Archived submissions posts")
 
     @tasks.loop(hours=12)
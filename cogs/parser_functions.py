@@ -3,37 +3,315 @@ import difflib
 import re
 import aiofiles
 import json 
-import datetime
+import hashlib
+import asyncio
+import time
+import os
+import shutil
+import csv
+import io
+import itertools
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import sqlite3
+import archive_db
+from parsed_store import ShardedStore
+from dataclasses import dataclass, field
 from pathlib import Path
 from discord.ext import commands
 from discord import app_commands
 from typing import Type
-from parser import set_contributor_username_lookup, message_parse, reset_contributor_username_lookup
-from constants import ARCHIVER_ID, LOG_CHANNEL, MENTION_RE, HIGHER_ROLES, NON_ARCHIVE_CATEGORIES, MAIN_ARCHIVE_CATEGORIES
+from cogs.utility import ProgressReporter
+from parser import ParseError, ParseOutcome, error_kind, ParseProfile, materialize, parse_post_job
+from constants import ARCHIVER_ID, LOG_CHANNEL, MENTION_RE, HIGHER_ROLES, NON_ARCHIVE_CATEGORIES, MAIN_ARCHIVE_CATEGORIES, PARSE_CACHE, PARSE_FETCH_CONCURRENCY, PARSE_QUEUE_SIZE, USERNAME_CACHE, USERNAME_CACHE_TTL, USERNAME_FETCH_CONCURRENCY, REPARSE_DEBOUNCE, PARSED_VERSIONS_DIR, PARSE_JOURNAL, PARSE_CHANNEL_CONCURRENCY, PARSE_REQUEST_BUDGET, PARSE_REPORT_INTERVAL, PARSE_REPORT_PAGE_SIZE, ARCHIVE_DB, PARSE_OUTPUT_FORMAT, PARSE_WORKERS, PARSE_PROFILE_TOP
+
+# Incremental parse cache
+class ParseCache:
+    """Remembers what each thread looked like when it was last parsed successfully, so unchanged threads can be skipped."""
+    def __init__(self, path: str):
+        self.path = path
+        self.save_lock = asyncio.Lock()
+        try:
+            with open(path, "r") as f:
+                content = f.read()
+                self.entries: dict[str, dict] = json.loads(content) if content else {}
+        except FileNotFoundError:
+            self.entries = {}
+
+    @staticmethod
+    def content_hash(messages: list[str]) -> str:
+        return hashlib.sha256("\n".join(messages).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def fingerprint(thread: discord.Thread) -> dict[str, str|list[str]]:
+        # Everything besides the message content that ends up in the parsed file
+        return {
+            "last_message_id": str(thread.last_message_id),
+            "name": thread.name,
+            "tags": sorted(str(tag.id) for tag in thread.applied_tags),
+        }
+
+    def is_fresh(self, thread: discord.Thread, has_output: bool) -> bool:
+        # No new messages, title or tag changes since the last parse, history does not need to be fetched
+        entry = self.entries.get(str(thread.id))
+        if entry is None or not has_output:
+            return False
+        return all(entry.get(key) == value for key, value in self.fingerprint(thread).items())
+
+    def is_unchanged(self, thread: discord.Thread, content_hash: str, has_output: bool) -> bool:
+        # History was fetched but the post content is identical, the parse can be skipped
+        entry = self.entries.get(str(thread.id))
+        if entry is None or not has_output or entry.get("content_hash") != content_hash:
+            return False
+        # Only new messages may differ, a rename or retag still has to rewrite the title, slug and tags
+        fingerprint = self.fingerprint(thread)
+        return entry.get("name") == fingerprint["name"] and entry.get("tags") == fingerprint["tags"]
+
+    def update(self, thread: discord.Thread, content_hash: str):
+        self.entries[str(thread.id)] = {**self.fingerprint(thread), "content_hash": content_hash}
+
+    def invalidate(self, thread_id: int):
+        self.entries.pop(str(thread_id), None)
+
+    def clear(self):
+        self.entries.clear()
+
+    async def save(self):
+        # Background re-parses can finish at the same time as a command run
+        async with self.save_lock:
+            async with aiofiles.open(self.path, mode='w') as f:
+                await f.write(json.dumps(self.entries))
+
+# Persistent user id -> display name cache for contributor names
+class UsernameCache:
+    """Display names by user id, kept on disk between runs and refreshed once older than USERNAME_CACHE_TTL."""
+    def __init__(self, bot: commands.Bot, path: str):
+        self.bot = bot
+        self.path = path
+        self.fetch_semaphore = asyncio.Semaphore(USERNAME_FETCH_CONCURRENCY)
+        self.save_lock = asyncio.Lock()
+        self.dirty = False
+        # str(user id) -> [display name or None if the user does not exist, unix time it was looked up]
+        try:
+            with open(path, "r") as f:
+                content = f.read()
+                self.entries: dict[str, list] = json.loads(content) if content else {}
+        except FileNotFoundError:
+            self.entries = {}
+
+    def store(self, user_id: int, name: str | None):
+        entry = self.entries.get(str(user_id))
+        if entry is None or entry[0] != name:
+            self.dirty = True
+        self.entries[str(user_id)] = [name, time.time()]
+
+    def seed(self, guilds: list[discord.Guild]):
+        # Every cached guild member is a free lookup, same name as User.display_name
+        for guild in guilds:
+            for member in guild.members:
+                self.store(member.id, member.global_name or member.name)
+        self.dirty = True
+
+    def get_fresh(self, user_id: int) -> list | None:
+        entry = self.entries.get(str(user_id))
+        if entry is None or time.time() - entry[1] > USERNAME_CACHE_TTL:
+            return None
+        return entry
+
+    async def fetch(self, user_id: int, progress: ProgressReporter | None = None):
+        async with self.fetch_semaphore:
+            if progress is not None:
+                progress.api_calls += 1
+            try:
+                user = await self.bot.fetch_user(user_id)
+            except discord.NotFound:
+                # Remember deleted users so they are not fetched on every run
+                self.store(user_id, None)
+                return
+            except (discord.Forbidden, discord.HTTPException):
+                return
+        self.store(user_id, user.display_name)
+
+    async def resolve(self, user_ids: set[int], progress: ProgressReporter | None = None) -> dict[int, str]:
+        missing = []
+        for user_id in user_ids:
+            if self.get_fresh(user_id) is not None:
+                continue
+            user = self.bot.get_user(user_id)
+            if user is not None:
+                self.store(user_id, user.display_name)
+            else:
+                missing.append(user_id)
+        await asyncio.gather(*(self.fetch(user_id, progress) for user_id in missing))
+
+        lookup: dict[int, str] = {}
+        for user_id in user_ids:
+            entry = self.entries.get(str(user_id))
+            if entry is not None and entry[0]:
+                lookup[user_id] = entry[0]
+        return lookup
+
+    async def save(self):
+        if not self.dirty:
+            return
+        async with self.save_lock:
+            self.dirty = False
+            async with aiofiles.open(self.path, mode='w') as f:
+                await f.write(json.dumps(self.entries))
+
+# Checkpoint journal for /parse_archive
+class ParseJournal:
+    """Append-only record of the channels and threads a /parse_archive run has finished, so a restarted run can resume."""
+    def __init__(self, path: str):
+        self.path = path
+        self.full = False
+        # Name of the output directory in PARSED_VERSIONS_DIR the run is filling
+        self.output: str | None = None
+        self.channels: set[int] = set()
+        self.threads: set[int] = set()
+        try:
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # The last line may be cut short by the restart
+                        continue
+                    if "full" in record:
+                        self.full = record["full"]
+                        self.output = record.get("output")
+                    elif "channel" in record:
+                        self.channels.add(record["channel"])
+                    elif "thread" in record:
+                        self.threads.add(record["thread"])
+        except FileNotFoundError:
+            pass
+
+    def exists(self) -> bool:
+        return Path(self.path).exists()
+
+    async def start(self, full: bool, output: str):
+        self.full = full
+        self.output = output
+        self.channels.clear()
+        self.threads.clear()
+        async with aiofiles.open(self.path, mode='w') as f:
+            await f.write(json.dumps({"full": full, "output": output}) + "\n")
+
+    async def append(self, record: dict):
+        async with aiofiles.open(self.path, mode='a') as f:
+            await f.write(json.dumps(record) + "\n")
+
+    async def record_thread(self, thread_id: int):
+        self.threads.add(thread_id)
+        await self.append({"thread": thread_id})
+
+    async def record_channel(self, channel_id: int):
+        self.channels.add(channel_id)
+        await self.append({"channel": channel_id})
+
+    def discard(self):
+        Path(self.path).unlink(missing_ok=True)
+
+# Parse run counters
+@dataclass
+class ParseRunStats:
+    total: int = 0
+    errors: int = 0
+    skipped: int = 0
+    max_queue_depth: dict[str, int] = field(default_factory=dict)
+    # Error items that were not sent to the channel, for the caller to report
+    unreported: list["ParserErrorItem"] = field(default_factory=list)
+    # Per field and per post parse timings, only collected when set
+    profile: ParseProfile | None = None
+
+    def observe_queue(self, stage: str, queue: asyncio.Queue):
+        self.max_queue_depth[stage] = max(self.max_queue_depth.get(stage, 0), queue.qsize())
+
+    def merge(self, other: "ParseRunStats"):
+        self.total += other.total
+        self.errors += other.errors
+        self.skipped += other.skipped
+        for stage, depth in other.max_queue_depth.items():
+            self.max_queue_depth[stage] = max(self.max_queue_depth.get(stage, 0), depth)
+        if other.profile is not None:
+            if self.profile is None:
+                self.profile = ParseProfile()
+            self.profile.merge(other.profile)
+
+    def summary(self) -> str:
+        depths = ", ".join(f"{stage} {depth}" for stage, depth in self.max_queue_depth.items())
+        return f"Errors: {self.errors}/{self.total}.\nUnchanged: {self.skipped}.\nMax queue depth: {depths or 'none'}."
+
+    def profile_summary(self, limit: int) -> str:
+        if self.profile is None or not self.profile.posts:
+            return "No posts were parsed, nothing to profile."
+        lines = ["**Slowest fields** (total, calls, mean, max)"]
+        for name, timing in self.profile.slowest_fields(limit):
+            lines.append(f"- {name}: {timing.total_ns / 1e6:.1f}ms, {timing.calls}, {timing.total_ns / timing.calls / 1e3:.0f}µs, {timing.max_ns / 1e3:.0f}µs")
+        lines.append("**Slowest posts**")
+        for elapsed_ns, label in self.profile.slowest_posts(limit):
+            lines.append(f"- {label}: {elapsed_ns / 1e6:.1f}ms")
+        return "\n".join(lines)
+
+def messages_in_span(contents: list[str], span: tuple[int, int]) -> list[int]:
+    # Indexes of the post messages holding lines start..stop of the joined post, including the section heading
+    start, stop = max(span[0] - 1, 0), span[1]
+    indexes = []
+    line = 0
+    for index, content in enumerate(contents):
+        line_count = content.count("\n") + 1
+        if line < stop and line + line_count > start:
+            indexes.append(index)
+        line += line_count
+    return indexes
 
 # Parse error views
+# Added under the buttons of a post with more than 5 messages to edit
+EDIT_BUTTON_OVERFLOW_NOTE = "-# Max 5 buttons exceeded, edit directly in thread instead."
+
 class ParserErrorItem(discord.ui.Container):
-    def __init__(self, bot: commands.Bot, thread: discord.Thread, error: Exception, i: int):
+    def __init__(self, bot: commands.Bot, thread: discord.Thread, error: Exception, i: int, issues: list[ParseError] | None = None, text_limit: int = 4000 - len(EDIT_BUTTON_OVERFLOW_NOTE)):
         super().__init__()
         self.accent_color = discord.Color.red()
         self.bot = bot
         self.thread = thread
         self.i = i
-        self.text_display = discord.ui.TextDisplay(f"{thread.jump_url}: **{type(error).__name__}**: {error}")
+        # Every problem in the post when they were collected, otherwise just the error that stopped the parse
+        self.issues = issues or [error]
+        lines = [f"{thread.jump_url}: {len(self.issues)} problem(s)"] if len(self.issues) > 1 else []
+        for issue in self.issues:
+            location = f" in **{issue.path}**" if isinstance(issue, ParseError) and issue.path else ""
+            prefix = "-" if len(self.issues) > 1 else thread.jump_url
+            lines.append(f"{prefix}{location}: **{error_kind(issue)}**: {issue}")
+        self.text_display = discord.ui.TextDisplay("\n".join(lines)[:text_limit])
         self.action_row = discord.ui.ActionRow()
         self.add_item(self.text_display)
         self.add_item(self.action_row)
 
     @classmethod
-    async def create(cls: Type["ParserErrorItem"], bot: commands.Bot, thread: discord.Thread, error: Exception, i: int):
-        reverse_messages = reversed([message async for message in thread.history()])
-        instance = cls(bot, thread, error, i)
-        for i, message in enumerate(reverse_messages):
-            if (i >= 5):
-                instance.add_item(discord.ui.TextDisplay("-# Max 5 buttons exceeded, edit directly in thread instead."))
+    async def create(cls: Type["ParserErrorItem"], bot: commands.Bot, thread: discord.Thread, error: Exception, i: int, issues: list[ParseError] | None = None, post_messages: list[discord.Message] | None = None, text_limit: int = 4000 - len(EDIT_BUTTON_OVERFLOW_NOTE)):
+        # Same messages, in the same order, as the ones joined for parsing, only fetched if the caller does not have them already
+        if post_messages is None:
+            post_messages = [
+                message async for message in thread.history(limit=None, oldest_first=True)
+                if message.content and message.type == discord.MessageType.default
+            ]
+        instance = cls(bot, thread, error, i, issues, text_limit)
+        # Only offer the messages the failing sections came from when the parser knows where they are
+        spans = [issue.span for issue in instance.issues if isinstance(issue, ParseError) and issue.span is not None]
+        if spans and len(spans) == len(instance.issues):
+            contents = [message.content for message in post_messages]
+            indexes = sorted({index for span in spans for index in messages_in_span(contents, span)})
+        else:
+            indexes = list(range(len(post_messages)))
+        for count, index in enumerate(indexes):
+            if (count >= 5):
+                instance.add_item(discord.ui.TextDisplay(EDIT_BUTTON_OVERFLOW_NOTE))
                 break
-            button = discord.ui.Button(label=f"Edit {i}")
-            button.callback = instance.get_editor(message)
+            button = discord.ui.Button(label=f"Edit {index}")
+            button.callback = instance.get_editor(post_messages[index])
             instance.action_row.add_item(button)
         return instance
     
@@ -44,6 +322,114 @@ class ParserErrorItem(discord.ui.Container):
             await interaction.response.send_modal(PostEditAndParseModal(self.bot, message, interaction.message, self.i))
         return edit
 
+# Every failure of a parse run in one paginated message instead of one message each
+class ParseErrorReport(discord.ui.LayoutView):
+    # A message shares 4000 characters of text between all its text displays: the header, and per item its text and button overflow note
+    HEADER_TEXT_LIMIT = 200
+    ITEM_TEXT_LIMIT = (4000 - HEADER_TEXT_LIMIT) // PARSE_REPORT_PAGE_SIZE - len(EDIT_BUTTON_OVERFLOW_NOTE)
+
+    def __init__(self, channel: discord.abc.Messageable):
+        super().__init__(timeout=None)
+        self.channel = channel
+        self.items: list[ParserErrorItem] = []
+        self.page = 0
+        self.message: discord.Message | None = None
+        self.dirty = False
+        self.closed = asyncio.Event()
+        self.flush_task: asyncio.Task | None = None
+        self.header = discord.ui.TextDisplay("")
+        self.previous_button = discord.ui.Button(label="Previous")
+        self.previous_button.callback = self.turn_page(-1)
+        self.next_button = discord.ui.Button(label="Next")
+        self.next_button.callback = self.turn_page(1)
+        self.navigation = discord.ui.ActionRow(self.previous_button, self.next_button)
+
+    def add(self, item: ParserErrorItem):
+        self.items.append(item)
+        self.dirty = True
+        # Sending starts with the first failure, clean runs post nothing
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self.flush_loop())
+
+    def page_count(self) -> int:
+        return max((len(self.items) + PARSE_REPORT_PAGE_SIZE - 1) // PARSE_REPORT_PAGE_SIZE, 1)
+
+    def render(self):
+        self.page = min(self.page, self.page_count() - 1)
+        issue_count = sum(len(item.issues) for item in self.items)
+        self.header.content = f"**Parse errors**: {len(self.items)} post(s), {issue_count} problem(s) - page {self.page + 1}/{self.page_count()}"[:self.HEADER_TEXT_LIMIT]
+        self.previous_button.disabled = self.page == 0
+        self.next_button.disabled = self.page >= self.page_count() - 1
+        self.clear_items()
+        self.add_item(self.header)
+        self.add_item(discord.ui.File("attachment://parse_errors.json"))
+        self.add_item(discord.ui.File("attachment://parse_errors.csv"))
+        start = self.page * PARSE_REPORT_PAGE_SIZE
+        for item in self.items[start:start + PARSE_REPORT_PAGE_SIZE]:
+            self.add_item(item)
+        self.add_item(self.navigation)
+
+    def files(self) -> list[discord.File]:
+        rows = []
+        for item in self.items:
+            for issue in item.issues:
+                span = issue.span if isinstance(issue, ParseError) else None
+                rows.append({
+                    "thread_id": str(item.thread.id),
+                    "thread_name": item.thread.name,
+                    "url": item.thread.jump_url,
+                    "path": issue.path if isinstance(issue, ParseError) else "",
+                    "line_start": span[0] if span else None,
+                    "line_stop": span[1] if span else None,
+                    "type": error_kind(issue),
+                    "message": str(issue),
+                })
+        csv_buffer = io.StringIO()
+        writer = csv.DictWriter(csv_buffer, fieldnames=["thread_id", "thread_name", "url", "path", "line_start", "line_stop", "type", "message"])
+        writer.writeheader()
+        writer.writerows(rows)
+        return [
+            discord.File(io.BytesIO(json.dumps(rows, indent=4).encode("utf-8")), filename="parse_errors.json"),
+            discord.File(io.BytesIO(csv_buffer.getvalue().encode("utf-8")), filename="parse_errors.csv"),
+        ]
+
+    async def flush(self):
+        if not self.dirty:
+            return
+        self.dirty = False
+        self.render()
+        # A failed send or edit should never take the parse run down with it, the next flush tries again
+        try:
+            if self.message is None:
+                self.message = await self.channel.send(view=self, files=self.files())
+            else:
+                self.message = await self.message.edit(view=self, attachments=self.files())
+        except discord.HTTPException as e:
+            self.dirty = True
+            print(f"Parse error report update failed: {e}")
+
+    async def flush_loop(self):
+        # At most one send or edit per PARSE_REPORT_INTERVAL, however fast failures come in
+        while not self.closed.is_set():
+            await self.flush()
+            try:
+                await asyncio.wait_for(self.closed.wait(), PARSE_REPORT_INTERVAL)
+            except TimeoutError:
+                pass
+        await self.flush()
+
+    async def close(self):
+        self.closed.set()
+        if self.flush_task is not None:
+            await self.flush_task
+
+    def turn_page(self, step: int):
+        async def turn(interaction: discord.Interaction[commands.Bot]):
+            self.page += step
+            self.render()
+            await interaction.response.edit_message(view=self)
+        return turn
+
 class PostEditModal(discord.ui.Modal, title="Edit Post"):
     def __init__(self, bot: commands.Bot, message: discord.Message):
         super().__init__()
@@ -75,37 +461,143 @@ class PostEditAndParseModal(PostEditModal):
     
     async def on_submit(self, interaction: discord.Interaction[commands.Bot]):
         await super().on_submit(interaction)
+        thread = self.message.channel
         parser_cog = interaction.client.get_cog("Parser")
-        data = await parser_cog.get_post_data(self.message.thread, self.message.channel.parent, self.bot)
+        parser_cog.parse_cache.invalidate(thread.id)
+        post_messages = await parser_cog.fetch_post_messages(thread)
+        data = await parser_cog.get_post_data(thread, thread.parent, self.bot, post_messages)
         username_lookup = await parser_cog.build_username_lookup_from_messages(data["messages"])
-        lookup_token = set_contributor_username_lookup(username_lookup)
+        await parser_cog.usernames.save()
+        # Sections left untouched by the edit are reused from the failed parse
+        section_cache = parser_cog.section_caches.pop(thread.id, {})
 
-        try:
-            parse_result = message_parse("\n".join(data["messages"]).split("\n"))
-        except Exception as e:
-            new_item = await ParserErrorItem.create(self.bot, self.message.thread, e, self.i)
+        lines = "\n".join(data["messages"]).split("\n")
+        del data["messages"]
+        outcome = await parser_cog.run_parse(lines, username_lookup, section_cache, data, "variants")
+        if outcome.error is not None:
+            parser_cog.section_caches[thread.id] = outcome.section_cache
+            new_item = await ParserErrorItem.create(self.bot, thread, outcome.error, self.i, outcome.issues, post_messages)
             new_view = discord.ui.LayoutView()
             new_view.add_item(new_item)
             await self.parse_response_message.channel.send(view=new_view)
             return
-        finally:
-            reset_contributor_username_lookup(lookup_token)
         
         new_item = discord.ui.TextDisplay(f"{self.message.jump_url}: Parse successful.")
         new_view = discord.ui.LayoutView()
         new_view.add_item(new_item)
         await self.parse_response_message.channel.send(view=new_view)
         
-        del data["messages"]
-        data["variants"] = parse_result
-        parsed_path = Path.cwd() / "parsed" / f"{self.message.thread.id}.json"
-        
-        with open(parsed_path, "w") as f:
-            json.dump(data, f, indent=4)
+        await parser_cog.save_parsed(thread.id, outcome.serialized)
 
 class Parser(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.parse_cache = ParseCache(PARSE_CACHE)
+        self.usernames = UsernameCache(bot, USERNAME_CACHE)
+        # Thread id -> sections of its last failed parse, kept so a fix through the edit modal only re-parses what changed
+        self.section_caches: dict[int, dict] = {}
+        # Thread id -> debounced re-parse waiting for edits to settle
+        self.pending_reparses: dict[int, asyncio.Task] = {}
+        # Shared by every parse run so concurrent channels cannot flood the API
+        self.request_budget = asyncio.Semaphore(PARSE_REQUEST_BUDGET)
+        # SQLite copy of parsed/, updated post by post as files are written
+        self.archive_db = archive_db.connect(ARCHIVE_DB)
+        self.archive_db_lock = asyncio.Lock()
+        # Output directory -> open sharded store, unused when PARSE_OUTPUT_FORMAT is "files"
+        self.stores: dict[Path, ShardedStore] = {}
+        # Output directory of an unfinished /parse_archive run, as long as its journal exists.
+        # Posts parsed outside the run are written there too, or the swap would drop them
+        self.staging_dir = self.unfinished_run_dir(ParseJournal(PARSE_JOURNAL))
+        # Thread ids written outside the run while it was going, their cache entries are dropped after the swap
+        self.parsed_during_run: set[int] = set()
+        # Parsing and serializing large posts would otherwise hold up the gateway heartbeat.
+        # forkserver, forking a process with a running event loop and worker threads is unsafe
+        self.parse_executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("forkserver")) if PARSE_WORKERS > 0 else None
+
+    async def cog_load(self):
+        self.link_parsed_dir()
+        # A new database starts from whatever is already parsed, skipped posts are never re-written
+        parsed_dir = Path.cwd() / "parsed"
+        if archive_db.post_count(self.archive_db) == 0 and parsed_dir.exists():
+            store = self.store_for(parsed_dir)
+            if store is None:
+                await self.update_archive_db(archive_db.export_directory, parsed_dir)
+            else:
+                await self.update_archive_db(archive_db.export_documents, (record for _, record in store.iter_records()))
+
+    async def cog_unload(self):
+        for pending in self.pending_reparses.values():
+            pending.cancel()
+        async with self.archive_db_lock:
+            self.archive_db.close()
+        self.close_stores()
+        if self.parse_executor is not None:
+            self.parse_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run_parse(self, lines: list[str], username_lookup: dict[int, str], section_cache: dict, document: dict | None = None, result_key: str = "post_data", profile_label: str | None = None) -> ParseOutcome:
+        # Compact JSON for the sharded store, pretty-printed for per-post files
+        indent = 4 if PARSE_OUTPUT_FORMAT == "files" else None
+        job = functools.partial(parse_post_job, lines, username_lookup, section_cache, document, result_key, indent, profile_label)
+        return await asyncio.get_running_loop().run_in_executor(self.parse_executor, job)
+
+    # Parsed output helpers, one file per post or a sharded store depending on PARSE_OUTPUT_FORMAT
+    def store_for(self, directory: Path) -> ShardedStore | None:
+        if PARSE_OUTPUT_FORMAT == "files":
+            return None
+        if directory not in self.stores:
+            self.stores[directory] = ShardedStore.for_format(directory, PARSE_OUTPUT_FORMAT)
+        return self.stores[directory]
+
+    def close_stores(self):
+        for store in self.stores.values():
+            store.close()
+        self.stores.clear()
+
+    def has_parsed(self, thread_id: int, directory: Path) -> bool:
+        store = self.store_for(directory)
+        if store is not None:
+            return thread_id in store
+        return (directory / f"{thread_id}.json").exists()
+
+    def parsed_ids(self, directory: Path) -> list[str]:
+        store = self.store_for(directory)
+        if store is not None:
+            return store.ids()
+        return [file.stem for file in directory.glob("*.json")]
+
+    async def write_parsed(self, thread_id: int, json_string: str, directory: Path):
+        store = self.store_for(directory)
+        if store is not None:
+            store.put_text(thread_id, json_string)
+            return
+        # Renamed over the previous file, so readers never see a partial one and a file hardlinked into staging is never modified in place
+        file_path = directory / f"{thread_id}.json"
+        temporary_path = directory / f"{thread_id}.json.tmp"
+        async with aiofiles.open(temporary_path, mode='w', encoding='utf-8') as f:
+            await f.write(json_string)
+        os.replace(temporary_path, file_path)
+
+    def delete_parsed(self, thread_id: int, directory: Path):
+        store = self.store_for(directory)
+        if store is not None:
+            store.delete(thread_id)
+        else:
+            (directory / f"{thread_id}.json").unlink(missing_ok=True)
+
+    async def save_parsed(self, thread_id: int, json_string: str):
+        # Output of a parse outside /parse_archive, which would otherwise be lost when an unfinished run is swapped in
+        await self.write_parsed(thread_id, json_string, Path.cwd() / "parsed")
+        if self.staging_dir is not None and self.staging_dir.exists():
+            await self.write_parsed(thread_id, json_string, self.staging_dir)
+            self.parsed_during_run.add(thread_id)
+
+    async def update_archive_db(self, function, *args):
+        # One writer at a time, off the event loop. The JSON files stay the source of truth, so a failed update is only logged
+        async with self.archive_db_lock:
+            try:
+                return await asyncio.to_thread(function, self.archive_db, *args)
+            except sqlite3.Error as e:
+                print(f"Archive database update failed: {e}")
 
     def get_post_metadata(self, thread: discord.Thread, channel: discord.ForumChannel, bot: commands.Bot) -> dict[str, str|list[str]]:
         #Returns a dict of metadata to add on top of the post message
@@ -120,103 +612,357 @@ class Parser(commands.Cog):
             "messages": []
         }
 
+    @commands.Cog.listener()
+    async def on_ready(self):
+        self.usernames.seed(self.bot.guilds)
+        await self.usernames.save()
+
+    def is_archive_thread(self, channel) -> bool:
+        return isinstance(channel, discord.Thread) and isinstance(channel.parent, discord.ForumChannel) and channel.parent.category_id in MAIN_ARCHIVE_CATEGORIES
+
+    # Re-parse archive posts as they change so parsed/ stays fresh without full rescans
+    def schedule_reparse(self, thread_id: int):
+        pending = self.pending_reparses.get(thread_id)
+        if pending is not None:
+            pending.cancel()
+        self.pending_reparses[thread_id] = asyncio.create_task(self.reparse_after_debounce(thread_id))
+
+    async def reparse_after_debounce(self, thread_id: int):
+        try:
+            await asyncio.sleep(REPARSE_DEBOUNCE)
+        except asyncio.CancelledError:
+            return
+        # Past the debounce the re-parse runs to completion, later changes queue a new one
+        if self.pending_reparses.get(thread_id) is asyncio.current_task():
+            del self.pending_reparses[thread_id]
+        thread = self.bot.get_channel(thread_id)
+        if thread is None:
+            try:
+                thread = await self.bot.fetch_channel(thread_id)
+            except discord.NotFound:
+                await self.remove_parsed_thread(thread_id)
+                return
+            except (discord.Forbidden, discord.HTTPException):
+                return
+        if not self.is_archive_thread(thread):
+            return
+
+        async def single_thread_gen():
+            yield thread
+
+        self.parse_cache.invalidate(thread_id)
+        try:
+            await self.parse_threads_stream(single_thread_gen(), use_cache=False)
+        except Exception as e:
+            print(f"Re-parse of {thread_id} failed: {e}")
+
+    async def remove_parsed_thread(self, thread_id: int):
+        pending = self.pending_reparses.pop(thread_id, None)
+        if pending is not None:
+            pending.cancel()
+        self.section_caches.pop(thread_id, None)
+        self.parse_cache.invalidate(thread_id)
+        self.delete_parsed(thread_id, Path.cwd() / "parsed")
+        if self.staging_dir is not None and self.staging_dir.exists():
+            self.delete_parsed(thread_id, self.staging_dir)
+        await self.update_archive_db(archive_db.delete_post, thread_id)
+        await self.parse_cache.save()
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        if self.is_archive_thread(message.channel):
+            self.schedule_reparse(message.channel.id)
+
+    async def handle_raw_message_change(self, channel_id: int):
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            # Archived threads are usually not cached. One that has been parsed before is an archive post,
+            # its cache entry goes right away so an incremental run fetches it again even if the re-parse never happens
+            if str(channel_id) in self.parse_cache.entries:
+                self.parse_cache.invalidate(channel_id)
+                await self.parse_cache.save()
+                self.schedule_reparse(channel_id)
+        elif self.is_archive_thread(channel):
+            self.schedule_reparse(channel_id)
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        await self.handle_raw_message_change(payload.channel_id)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        await self.handle_raw_message_change(payload.channel_id)
+
+    @commands.Cog.listener()
+    async def on_thread_update(self, before: discord.Thread, after: discord.Thread):
+        if not self.is_archive_thread(after):
+            return
+        # Title and tags end up in the parsed file, archiving or locking does not
+        if before.name != after.name or before.applied_tags != after.applied_tags:
+            self.schedule_reparse(after.id)
+
+    @commands.Cog.listener()
+    async def on_raw_thread_delete(self, payload: discord.RawThreadDeleteEvent):
+        if payload.parent_id is None:
+            return
+        parent = self.bot.get_channel(payload.parent_id)
+        if isinstance(parent, discord.ForumChannel) and parent.category_id in MAIN_ARCHIVE_CATEGORIES:
+            await self.remove_parsed_thread(payload.thread_id)
+
     # Discord id->username helper
     async def get_username_from_id(self, user_id: int) -> str | None:
         """Finds the name and ID of a user using their user ID"""
-        user = self.bot.get_user(user_id)
-        if user is None:
-            try:
-                user = await self.bot.fetch_user(user_id)
-            except (discord.NotFound, discord.Forbidden, discord.HTTPException):
-                return None
-
-        return user.display_name if hasattr(user, "display_name") else user.name
+        return (await self.usernames.resolve({user_id})).get(user_id)
 
 
-    async def build_username_lookup_from_messages(self, messages: list[str]) -> dict[int, str]:
+    async def build_username_lookup_from_messages(self, messages: list[str], progress: ProgressReporter | None = None) -> dict[int, str]:
         """Builds a per-request cache of user_id -> username from message mentions."""
         user_ids: set[int] = set()
         for message in messages:
             for match in MENTION_RE.finditer(message):
                 user_ids.add(int(match.group(1)))
 
-        username_lookup: dict[int, str] = {}
-        for user_id in user_ids:
-            username = await self.get_username_from_id(user_id)
-            if username:
-                username_lookup[user_id] = username
+        return await self.usernames.resolve(user_ids, progress)
 
-        return username_lookup
+    async def fetch_post_messages(self, thread: discord.Thread, progress: ProgressReporter | None = None) -> list[discord.Message]:
+        # Post messages oldest first, without empty or discord messages (pin/rename thread)
+        return [
+            message async for message in self.budgeted(thread.history(limit=None, oldest_first=True), progress)
+            if message.content and message.type == discord.MessageType.default
+        ]
 
-    async def get_post_data(self, thread: discord.Thread, channel: discord.ForumChannel, bot: commands.Bot) -> dict[str, str|list[str]]:
+    async def get_post_data(self, thread: discord.Thread, channel: discord.ForumChannel, bot: commands.Bot, post_messages: list[discord.Message] | None = None) -> dict[str, str|list[str]]:
         #Gets the metadata for the post along with all the post messages
         # Add all the post messages to the metadata
         metadata = self.get_post_metadata(thread, channel, bot)
-        async for message in thread.history(limit=None, oldest_first=True):
-            # Add it if the message exists and is not a discord message (pin/rename thread)
-            if message.content and message.type == discord.MessageType.default:
-                metadata["messages"].append(message.content)
+        if post_messages is None:
+            post_messages = await self.fetch_post_messages(thread)
+        metadata["messages"] = [message.content for message in post_messages]
         return metadata
 
-    async def iter_all_threads(self, channel: discord.ForumChannel):
+    async def budgeted(self, iterator, progress: ProgressReporter | None = None, page_size: int = 100):
+        # Holds a request budget slot while the next item is awaited, which is when paginated iterators make their requests
+        iterator = aiter(iterator)
+        for count in itertools.count():
+            # A new page is requested every page_size items
+            if progress is not None and count % page_size == 0:
+                progress.api_calls += 1
+            async with self.request_budget:
+                try:
+                    item = await anext(iterator)
+                except StopAsyncIteration:
+                    return
+            yield item
+
+    async def iter_all_threads(self, channel: discord.ForumChannel, progress: ProgressReporter | None = None):
         #Iterates over all threads, active or not
         for thread in channel.threads:
             yield thread
 
-        async for thread in channel.archived_threads(limit=None):
+        async for thread in self.budgeted(channel.archived_threads(limit=None), progress):
             yield thread
 
     # Parse given threads to json and write to file
-    async def parse_threads_stream(self, thread_iter, interaction: discord.Interaction, reply_to_channel=True):
-        exceptions_view = discord.ui.LayoutView(timeout=None)
-        errors = total = 0
+    # Threads flow through a pipeline of bounded queues: thread iterator -> history fetchers -> parsers -> writer
+    # Errors are added to report, or kept in stats.unreported when there is none
+    # With an output_dir other than parsed/, skipped and failed threads carry their previous file over into it
+    async def parse_threads_stream(self, thread_iter, report: ParseErrorReport | None = None, use_cache=True, output_dir: Path | None = None, journal: ParseJournal | None = None, stats: ParseRunStats | None = None, progress: ProgressReporter | None = None) -> ParseRunStats:
+        # Pass stats in to watch the counters while the run is going
+        if stats is None:
+            stats = ParseRunStats()
+        fetch_queue: asyncio.Queue = asyncio.Queue(maxsize=PARSE_QUEUE_SIZE)
+        parse_queue: asyncio.Queue = asyncio.Queue(maxsize=PARSE_QUEUE_SIZE)
+        write_queue: asyncio.Queue = asyncio.Queue(maxsize=PARSE_QUEUE_SIZE)
+        fetchers_running = PARSE_FETCH_CONCURRENCY
+        # One parser per worker process keeps the pool busy, a single one would only ever have one post in it
+        parser_count = max(PARSE_WORKERS, 1)
+        parsers_running = parser_count
 
-        (Path.cwd() / "parsed").mkdir(parents=True, exist_ok=True)
+        parsed_dir = Path.cwd() / "parsed"
+        output_dir = output_dir or parsed_dir
+        output_dir.mkdir(parents=True, exist_ok=True)
 
-        async for thread in thread_iter:
-            total += 1
-            data = await self.get_post_data(thread=thread, channel=thread.parent, bot=interaction.client)
-            username_lookup = await self.build_username_lookup_from_messages(data["messages"])
-            lookup_token = set_contributor_username_lookup(username_lookup)
+        async def finish(thread: discord.Thread, keep_previous=False):
+            if keep_previous and output_dir != parsed_dir:
+                self.carry_over(thread.id, parsed_dir, output_dir)
+            if journal is not None:
+                await journal.record_thread(thread.id)
+            if progress is not None:
+                progress.advance()
 
-            try:
-                parse_result = message_parse("\n".join(data["messages"]).split("\n"))
-            except Exception as e:
-                error_view = await ParserErrorItem.create(self.bot, thread, e, 1)
-                exceptions_view.add_item(error_view)
-                if reply_to_channel:
-                    await interaction.channel.send(view=exceptions_view)
-                    exceptions_view = discord.ui.LayoutView(timeout=None)
-                errors += 1
-                continue
-            finally:
-                reset_contributor_username_lookup(lookup_token)
-
-            tags_serializable = []
-            for tag in thread.applied_tags:
-                tag_dict = {
-                    "id": str(tag.id),
-                    "name": tag.name,
+        async def produce():
+            async for thread in thread_iter:
+                stats.total += 1
+                # Already written before the run was interrupted
+                if journal is not None and thread.id in journal.threads:
+                    stats.skipped += 1
+                    continue
+                # Skip the history fetch entirely if nothing has been posted, renamed or retagged since the last parse
+                if use_cache and self.parse_cache.is_fresh(thread, self.has_parsed(thread.id, parsed_dir)):
+                    stats.skipped += 1
+                    await finish(thread, keep_previous=True)
+                    continue
+                await fetch_queue.put(thread)
+                stats.observe_queue("fetch", fetch_queue)
+            for _ in range(PARSE_FETCH_CONCURRENCY):
+                await fetch_queue.put(None)
+
+        async def fetch():
+            nonlocal fetchers_running
+            while (thread := await fetch_queue.get()) is not None:
+                # Message objects are kept so a failed parse can offer edit buttons without fetching the history again
+                post_messages = await self.fetch_post_messages(thread, progress)
+                data = await self.get_post_data(thread=thread, channel=thread.parent, bot=self.bot, post_messages=post_messages)
+                content_hash = self.parse_cache.content_hash(data["messages"])
+                if use_cache and self.parse_cache.is_unchanged(thread, content_hash, self.has_parsed(thread.id, parsed_dir)):
+                    self.parse_cache.update(thread, content_hash)
+                    stats.skipped += 1
+                    await finish(thread, keep_previous=True)
+                    continue
+                username_lookup = await self.build_username_lookup_from_messages(data["messages"], progress)
+                await parse_queue.put((thread, data, post_messages, content_hash, username_lookup))
+                stats.observe_queue("parse", parse_queue)
+            # The last fetcher to finish closes the parse stage
+            fetchers_running -= 1
+            if fetchers_running == 0:
+                for _ in range(parser_count):
+                    await parse_queue.put(None)
+
+        async def parse():
+            nonlocal parsers_running
+            while (item := await parse_queue.get()) is not None:
+                thread, data, post_messages, content_hash, username_lookup = item
+                tags_serializable = []
+                for tag in thread.applied_tags:
+                    tag_dict = {
+                        "id": str(tag.id),
+                        "name": tag.name,
+                    }
+                    tags_serializable.append(tag_dict)
+
+                json_data = {
+                    "parsed_at": discord.utils.utcnow().isoformat(),
+                    "category_name": thread.parent.category.name,
+                    "channel_id": str(thread.parent_id),
+                    "thread_id": str(thread.id),
+                    "slug": self.slugify(thread.name),
+                    "title": thread.name,
+                    "tags": tags_serializable,
                 }
-                tags_serializable.append(tag_dict)
-
-            json_data = {
-                "parsed_at": datetime.utcnow().isoformat(),
-                "category_name": thread.parent.category.name,
-                "channel_id": str(thread.parent_id),
-                "thread_id": str(thread.id),
-                "slug": self.slugify(thread.name),
-                "title": thread.name,
-                "tags": tags_serializable,
-                "post_data": parse_result
-            }
-
-            file_path = Path.cwd() / "parsed" / f"{thread.id}.json"
-            json_string = json.dumps(json_data, indent=4)
-            async with aiofiles.open(file_path, mode='w', encoding='utf-8') as f:
-                await f.write(json_string)
-
-        return errors, total
+                lines = "\n".join(data["messages"]).split("\n")
+                # Parsed and serialized in the worker pool, post_data is filled in there
+                # Profiled runs label each post with a link to its thread
+                profile_label = f"[{thread.name}]({thread.jump_url})" if stats.profile is not None else None
+                outcome = await self.run_parse(lines, username_lookup, self.section_caches.pop(thread.id, {}), json_data, profile_label=profile_label)
+                if outcome.profile is not None:
+                    stats.profile.merge(outcome.profile)
+                if outcome.error is not None:
+                    self.section_caches[thread.id] = outcome.section_cache
+                    self.parse_cache.invalidate(thread.id)
+                    # Report every problem at once so the author does not have to fix and re-run one at a time
+                    if report is not None:
+                        report.add(await ParserErrorItem.create(self.bot, thread, outcome.error, 1, outcome.issues, post_messages, ParseErrorReport.ITEM_TEXT_LIMIT))
+                    else:
+                        stats.unreported.append(await ParserErrorItem.create(self.bot, thread, outcome.error, 1, outcome.issues, post_messages))
+                    stats.errors += 1
+                    await finish(thread, keep_previous=True)
+                    continue
+
+                # Plain dicts for the archive database, the output was already serialized from the compact result
+                json_data["post_data"] = materialize(outcome.result)
+                await write_queue.put((thread, content_hash, json_data, outcome.serialized))
+                stats.observe_queue("write", write_queue)
+            # The last parser to finish closes the write stage
+            parsers_running -= 1
+            if parsers_running == 0:
+                await write_queue.put(None)
+
+        async def write():
+            while (item := await write_queue.get()) is not None:
+                thread, content_hash, json_data, json_string = item
+                if output_dir == parsed_dir:
+                    await self.save_parsed(thread.id, json_string)
+                else:
+                    await self.write_parsed(thread.id, json_string, output_dir)
+                self.parse_cache.update(thread, content_hash)
+                await self.update_archive_db(archive_db.upsert_post, json_data)
+                await finish(thread)
+
+        async with asyncio.TaskGroup() as pipeline:
+            pipeline.create_task(produce())
+            for _ in range(PARSE_FETCH_CONCURRENCY):
+                pipeline.create_task(fetch())
+            for _ in range(parser_count):
+                pipeline.create_task(parse())
+            pipeline.create_task(write())
+
+        await self.parse_cache.save()
+        await self.usernames.save()
+        return stats
+
+    def carry_over(self, thread_id: int, source_dir: Path, destination_dir: Path):
+        store = self.store_for(destination_dir)
+        if store is not None:
+            if thread_id not in store:
+                store.copy_from(self.store_for(source_dir), thread_id)
+            return
+        # Hardlink instead of copying, write_parsed replaces files instead of writing into them
+        source = source_dir / f"{thread_id}.json"
+        destination = destination_dir / f"{thread_id}.json"
+        if not source.exists() or destination.exists():
+            return
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copy2(source, destination)
+
+    def unfinished_run_dir(self, journal: ParseJournal) -> Path | None:
+        # Output directory of a /parse_archive run that was not swapped in, the journal outlives the swap if the bot stops right after it
+        if not journal.exists() or not journal.output:
+            return None
+        run_dir = Path.cwd() / PARSED_VERSIONS_DIR / journal.output
+        if not run_dir.exists() or run_dir.resolve() == (Path.cwd() / "parsed").resolve():
+            return None
+        return run_dir
+
+    def new_version_dir(self) -> Path:
+        versions_dir = Path.cwd() / PARSED_VERSIONS_DIR
+        versions_dir.mkdir(exist_ok=True)
+        name = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+        version_dir = versions_dir / name
+        suffix = itertools.count(1)
+        while version_dir.exists():
+            version_dir = versions_dir / f"{name}-{next(suffix)}"
+        return version_dir
+
+    def link_parsed_dir(self):
+        # parsed/ is a symlink to a directory in PARSED_VERSIONS_DIR, so a finished run can replace it with a single rename
+        parsed_link = Path.cwd() / "parsed"
+        if parsed_link.is_symlink():
+            return
+        live_dir = self.new_version_dir()
+        if parsed_link.exists():
+            # Output from before the versioned layout becomes the first version
+            parsed_link.rename(live_dir)
+        else:
+            live_dir.mkdir()
+        parsed_link.symlink_to(live_dir.relative_to(Path.cwd()), target_is_directory=True)
+
+    async def swap_in_staging(self, staging_dir: Path):
+        # A new symlink is renamed over parsed/, readers see either the old or the new archive and never a partial or missing one
+        parsed_link = Path.cwd() / "parsed"
+        new_link = Path.cwd() / "parsed.link"
+        # Nothing is written to the staging directory separately anymore, and open stores point into the directory being replaced
+        self.staging_dir = None
+        self.close_stores()
+        self.link_parsed_dir()
+        new_link.unlink(missing_ok=True)
+        new_link.symlink_to(staging_dir.relative_to(Path.cwd()), target_is_directory=True)
+        os.replace(new_link, parsed_link)
+        # Every other version is either the one just replaced or left over from an abandoned run
+        for version_dir in (Path.cwd() / PARSED_VERSIONS_DIR).iterdir():
+            if version_dir != staging_dir:
+                await asyncio.to_thread(shutil.rmtree, version_dir, ignore_errors=True)
 
     def slugify(self, text: str):
         # Lowercase
@@ -244,8 +990,12 @@ class Parser(commands.Cog):
         async def single_thread_gen():
             yield thread
 
-        errors, total = await self.parse_threads_stream(single_thread_gen(), interaction, reply_to_channel=False)
-        await interaction.response.send_message(content=f"Parsed {thread.name} successfully.\nErrors: {errors}/{total}", ephemeral=True)
+        stats = await self.parse_threads_stream(single_thread_gen(), use_cache=False)
+        await interaction.response.send_message(content=f"Parsed {thread.name} successfully.\nErrors: {stats.errors}/{stats.total}", ephemeral=True)
+        for error_item in stats.unreported:
+            exceptions_view = discord.ui.LayoutView(timeout=None)
+            exceptions_view.add_item(error_item)
+            await interaction.followup.send(view=exceptions_view, ephemeral=True)
 
     # Parse channel
     @app_commands.command(name="parse_channel", description="Parse the posts in a selected channel and check for errors")
@@ -257,43 +1007,95 @@ class Parser(commands.Cog):
             return
 
         await interaction.response.send_message("Beginning parsing. . .")
-        errors, total = await self.parse_threads_stream(self.iter_all_threads(channel), interaction)
-        await interaction.channel.send(f"Done parsing.\nErrors: {errors}/{total}.")
+        report = ParseErrorReport(interaction.channel)
+        try:
+            async with ProgressReporter(interaction.channel, f"Parsing {channel.name}", unit="posts") as progress:
+                stats = await self.parse_threads_stream(self.iter_all_threads(channel, progress), report, progress=progress)
+        finally:
+            await report.close()
+        await interaction.channel.send(f"Done parsing.\n{stats.summary()}")
 
 
     # Parse archive
     @app_commands.command(name="parse_archive", description="Parse the posts in the archive and check for errors")
+    @app_commands.describe(full="Ignore the parse cache and re-parse every post", stats="Time each field parser and list the slowest fields and posts, with full to include unchanged posts")
     @app_commands.checks.has_any_role(*HIGHER_ROLES)
-    async def parse_archive(self, interaction: discord.Interaction):
+    async def parse_archive(self, interaction: discord.Interaction, full: bool=False, stats: bool=False):
         await interaction.response.send_message("Beginning parsing. . .")
         parse_channel_list = [
             channel for channel in interaction.guild.channels 
             if isinstance(channel, discord.ForumChannel) and (channel.category_id in MAIN_ARCHIVE_CATEGORIES)
         ]
 
+        # Output goes to a new version directory that replaces parsed/ once every channel is done
+        journal = ParseJournal(PARSE_JOURNAL)
+        staging_dir = self.unfinished_run_dir(journal)
+        if not full and staging_dir is not None:
+            await interaction.channel.send(f"Resuming interrupted run: {len(journal.channels)} channels and {len(journal.threads)} posts already done.")
+        else:
+            self.staging_dir = None
+            if staging_dir is not None:
+                self.close_stores()
+                await asyncio.to_thread(shutil.rmtree, staging_dir)
+            staging_dir = self.new_version_dir()
+            staging_dir.mkdir()
+            await journal.start(full, staging_dir.name)
+        self.staging_dir = staging_dir
+        if full:
+            self.parse_cache.clear()
+
+        # Channels are scanned concurrently, archived thread pagination is mostly waiting on round trips
+        channel_stats: dict[int, ParseRunStats] = {}
+        channel_slots = asyncio.Semaphore(PARSE_CHANNEL_CONCURRENCY)
+
+        def channel_status(channel: discord.ForumChannel) -> str:
+            channel_run = channel_stats.get(channel.id)
+            if channel_run is None:
+                return f"Done in previous run: {channel.name}" if channel.id in journal.channels else f"Waiting: {channel.name}"
+            state = "Done" if channel.id in journal.channels else "Scanning"
+            return f"{state}: {channel.name} ({channel_run.total} posts, {channel_run.errors} errors)"
+
+        def status_text() -> str:
+            return f"{len(journal.channels)}/{len(parse_channel_list)} channels\n" + "\n".join(channel_status(channel) for channel in parse_channel_list)
+
+        async def scan_channel(channel: discord.ForumChannel):
+            if channel.id in journal.channels:
+                return
+            async with channel_slots:
+                channel_stats[channel.id] = ParseRunStats(profile=ParseProfile() if stats else None)
+                await self.parse_threads_stream(self.iter_all_threads(channel, progress), report, use_cache=not journal.full, output_dir=staging_dir, journal=journal, stats=channel_stats[channel.id], progress=progress)
+                await journal.record_channel(channel.id)
+
+        report = ParseErrorReport(interaction.channel)
+        try:
+            async with ProgressReporter(interaction.channel, "Parsing Status", unit="posts", describe=status_text) as progress:
+                async with asyncio.TaskGroup() as scans:
+                    for channel in parse_channel_list:
+                        scans.create_task(scan_channel(channel))
+        finally:
+            await report.close()
+
+        run_stats = ParseRunStats()
+        for channel_run in channel_stats.values():
+            run_stats.merge(channel_run)
+
+        # Threads that no longer exist were never written to staging and drop out with the swap
+        await self.swap_in_staging(staging_dir)
+        journal.discard()
         parsed_path = Path.cwd() / "parsed"
-        for file in parsed_path.glob("*.json"):
-            try:
-                file.unlink()
-            except Exception as e:
-                await interaction.channel.send(f"Failed to delete {file}: {e}")
-
-        errors = total = 0
-        total_channels = len(parse_channel_list)
-        current_channel_index = 1
-        embed = discord.Embed(title="Parsing Status", colour=discord.Colour.green())
-        update_message_obj = await interaction.channel.send(embed=embed)
-
-        for channel in parse_channel_list:
-            embed.description = f"{current_channel_index}/{total_channels} -> {channel.name}"
-            await update_message_obj.edit(embed=embed)
-            current_channel_index += 1
-
-            channel_errors, channel_total = await self.parse_threads_stream(self.iter_all_threads(channel), interaction)
-            errors += channel_errors
-            total += channel_total
-
-        await interaction.channel.send(f"Done parsing.\nErrors: {errors}/{total}.")
+        for thread_id in list(self.parse_cache.entries):
+            if not self.has_parsed(thread_id, parsed_path):
+                self.parse_cache.invalidate(thread_id)
+        # The run may have written an older parse of these over theirs, the next run fetches them again
+        for thread_id in self.parsed_during_run:
+            self.parse_cache.invalidate(thread_id)
+        self.parsed_during_run.clear()
+        await self.parse_cache.save()
+        await self.update_archive_db(archive_db.prune_posts, self.parsed_ids(parsed_path))
+
+        await interaction.channel.send(f"Done parsing.\n{run_stats.summary()}")
+        if stats:
+            await interaction.channel.send(run_stats.profile_summary(PARSE_PROFILE_TOP), suppress_embeds=True)
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Parser(bot))
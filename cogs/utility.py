@@ -2,10 +2,14 @@ import discord
 import asyncio
 import os, sys
 import difflib
+import time
+import threading
+import traceback
+from collections.abc import Callable
 from datetime import timedelta
 from discord.ext import commands
 from discord import app_commands
-from constants import LOG_CHANNEL, MODERATOR_ID, OTHER_ARCHIVES1, OTHER_ARCHIVES2, BUILDING_SERVERS, HIGHER_ROLES, HELPER_ID, COMMANDS_LIST, DISCORD_CHAR_LIMIT, STAFF_ROLES, FILE_LINK_DUMP_THREAD
+from constants import LOG_CHANNEL, MODERATOR_ID, OTHER_ARCHIVES1, OTHER_ARCHIVES2, BUILDING_SERVERS, HIGHER_ROLES, HELPER_ID, COMMANDS_LIST, DISCORD_CHAR_LIMIT, STAFF_ROLES, FILE_LINK_DUMP_THREAD, PROGRESS_INTERVAL, LOOP_LAG_INTERVAL, LOOP_LAG_THRESHOLD
 
 # Create tags selector
 class TagSelectView(discord.ui.View):
@@ -67,9 +71,130 @@ class UploadModal(discord.ui.Modal, title="Upload Files"):
 
         await interaction.followup.send(content=f"**The links for the given files:**\n{"\n".join(links)}", ephemeral=True)
 
+# Progress embed for long-running jobs
+class ProgressReporter:
+    """Edits a single status embed at most once per PROGRESS_INTERVAL, however many items the job goes through."""
+    def __init__(self, channel: discord.abc.Messageable, title: str, total: int | None = None, unit: str = "threads", describe: Callable[[], str] | None = None):
+        self.channel = channel
+        self.title = title
+        self.total = total
+        self.unit = unit
+        # Extra status text, read on every update
+        self.describe = describe
+        self.done = 0
+        self.api_calls = 0
+        self.started = time.monotonic()
+        self.message: discord.Message | None = None
+        self.closed = asyncio.Event()
+        self.update_task: asyncio.Task | None = None
+        self.last_snapshot = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.finish(failed=exc_type is not None)
+
+    def advance(self, count: int = 1):
+        self.done += count
+
+    async def paged(self, iterator, page_size: int = 100):
+        # Paginated iterators like archived_threads request a new page every page_size items, a full last page means one more request
+        count = 0
+        async for item in iterator:
+            if count % page_size == 0:
+                self.api_calls += 1
+            count += 1
+            yield item
+        if count % page_size == 0:
+            self.api_calls += 1
+
+    def snapshot(self) -> tuple:
+        return (self.done, self.total, self.api_calls, self.describe() if self.describe else "")
+
+    def render(self, state: str = "Running", colour: discord.Color = discord.Color.blue()) -> discord.Embed:
+        done, total, api_calls, description = self.last_snapshot = self.snapshot()
+        elapsed = time.monotonic() - self.started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        embed = discord.Embed(title=self.title, description=description[:4000] or None, colour=colour)
+        embed.add_field(name=state, value=f"{done}/{total} {self.unit}" if total else f"{done} {self.unit}")
+        embed.add_field(name="Rate", value=f"{rate:.1f} {self.unit}/s")
+        embed.add_field(name="API calls", value=str(api_calls))
+        embed.add_field(name="Elapsed", value=str(timedelta(seconds=int(elapsed))))
+        if state == "Running" and total and rate > 0:
+            embed.add_field(name="ETA", value=str(timedelta(seconds=int(max(total - done, 0) / rate))))
+        return embed
+
+    async def start(self):
+        self.started = time.monotonic()
+        self.message = await self.channel.send(embed=self.render())
+        self.update_task = asyncio.create_task(self.update_loop())
+
+    async def update_loop(self):
+        while not self.closed.is_set():
+            try:
+                await asyncio.wait_for(self.closed.wait(), PROGRESS_INTERVAL)
+            except TimeoutError:
+                if self.snapshot() != self.last_snapshot:
+                    await self.edit(self.render())
+
+    async def edit(self, embed: discord.Embed):
+        # A failed status edit should never take the job down with it
+        try:
+            await self.message.edit(embed=embed)
+        except discord.HTTPException:
+            pass
+
+    async def finish(self, failed: bool = False):
+        self.closed.set()
+        if self.update_task is not None:
+            await self.update_task
+        if self.message is not None:
+            await self.edit(self.render("Failed" if failed else "Done", discord.Color.red() if failed else discord.Color.green()))
+
 class Utility(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.loop_heartbeat = time.monotonic()
+        self.lag_monitor_stop = threading.Event()
+
+    async def cog_load(self):
+        loop = asyncio.get_running_loop()
+        self.heartbeat_task = asyncio.create_task(self.beat_heartbeat())
+        threading.Thread(target=self.watch_loop_lag, args=(loop, threading.get_ident()), name="loop-lag-monitor", daemon=True).start()
+
+    async def cog_unload(self):
+        self.lag_monitor_stop.set()
+        self.heartbeat_task.cancel()
+
+    # Event loop lag monitor
+    async def beat_heartbeat(self):
+        while True:
+            self.loop_heartbeat = time.monotonic()
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+
+    def watch_loop_lag(self, loop: asyncio.AbstractEventLoop, loop_thread_id: int):
+        # Runs in its own thread, so it can see the loop is stuck and where while it still is
+        reported = False
+        while not self.lag_monitor_stop.wait(LOOP_LAG_INTERVAL):
+            lag = time.monotonic() - self.loop_heartbeat - LOOP_LAG_INTERVAL
+            if lag < LOOP_LAG_THRESHOLD:
+                reported = False
+                continue
+            if reported:
+                continue
+            reported = True
+            frame = sys._current_frames().get(loop_thread_id)
+            frames = traceback.extract_stack(frame) if frame is not None else []
+            # Everything below the loop's callback runner belongs to the task that is blocking it
+            start = max((i + 1 for i, summary in enumerate(frames) if summary.name == "_run" and summary.filename.endswith("events.py")), default=0)
+            task_frames = frames[start:] or frames
+            coroutine = task_frames[0].name if task_frames else "unknown"
+            stack = "".join(traceback.format_list(task_frames[-8:]))
+            print(f"Event loop blocked for {lag:.1f}s by {coroutine}:\n{stack}")
+            # Delivered once the loop is free again
+            asyncio.run_coroutine_threadsafe(self.log(title="Event loop stalled", message=f"Blocked for over {lag:.1f}s by `{coroutine}`:\n```py\n{stack[-3800:]}```", colour=discord.Color.orange()), loop)
 
     # Log function
     async def log(self, title: str, message: str = "", colour: discord.Color = discord.Color.default(), description: str | None = None):
@@ -48,6 +48,26 @@ CROSS_EMOJI = "❌"
 ILLEGAL_COMPONENTS = {"@everyone", "@here"}
 MESSAGES_LIST = "messages.json"
 BLACKLIST = "blacklist.json"
+PARSE_CACHE = "parse_cache.json"
+PARSE_FETCH_CONCURRENCY = 4 # Threads whose history is fetched at the same time while parsing
+PARSE_QUEUE_SIZE = 16 # Max items waiting between parse pipeline stages
+USERNAME_CACHE = "usernames.json"
+USERNAME_CACHE_TTL = 7 * 24 * 60 * 60 # Seconds before a cached display name is looked up again
+USERNAME_FETCH_CONCURRENCY = 5 # Concurrent fetch_user calls for names missing from the cache
+REPARSE_DEBOUNCE = 30 # Seconds to wait after the last change to an archive post before re-parsing it
+PARSED_VERSIONS_DIR = "parsed.versions" # Parsed output directories, parsed/ is a symlink to the live one and /parse_archive fills a new one
+PARSE_JOURNAL = "parse_journal.jsonl" # Finished channels and threads of the current /parse_archive run
+PARSE_CHANNEL_CONCURRENCY = 6 # Channels /parse_archive scans at the same time
+PARSE_REQUEST_BUDGET = 10 # History and archived thread page requests in flight across all parse runs
+PARSE_REPORT_INTERVAL = 5 # Seconds between parse error report updates
+PARSE_REPORT_PAGE_SIZE = 3 # Failing posts per parse error report page
+ARCHIVE_DB = "archive.db" # SQLite copy of parsed/, kept up to date by every parse run
+PARSE_OUTPUT_FORMAT = "files" # "files" for one <thread_id>.json per post, "ndjson" or "ndjson.gz" for sharded NDJSON with an offset index
+PARSE_WORKERS = 2 # Processes that parse and serialize posts off the event loop, 0 uses a thread instead
+PARSE_PROFILE_TOP = 5 # Slowest fields and posts listed by /parse_archive stats:true
+PROGRESS_INTERVAL = 5 # Seconds between progress embed updates of long-running jobs
+LOOP_LAG_INTERVAL = 0.25 # Seconds between event loop heartbeats
+LOOP_LAG_THRESHOLD = 1.0 # Seconds the event loop can be blocked before the stall is logged
 DISCORD_CHAR_LIMIT = 2000
 TIMEOUT_MESSAGE = """Your message on TMCC has been blocked as you didn't select the right onboarding option when joining the server (see below) and your account is suspected to be a bot.
 \nIf you wish to partake in the server fully, make sure to select the correct option in the "Channels and Roles" section and follow the rules of the server."""
@@ -140,4 +160,4 @@ RANDOM_REPLIES = [
     "Watchu doin",
     "​      is        ",
     "I love you too <3"
-]
\ No newline at end of file
+]
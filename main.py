@@ -45,4 +45,6 @@ async def main():
     async with bot:
         await bot.start(TOKEN)
 
-asyncio.run(main())
\ No newline at end of file
+# Guarded so parser worker processes can import this module without starting another bot
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
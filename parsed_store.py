@@ -0,0 +1,258 @@
+import argparse
+import gzip
+import json
+import tracemalloc
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import BinaryIO, TextIO
+
+# Output layouts for parsed posts. "files" is one pretty-printed <thread_id>.json per
+# post, the other two append compact records to sharded NDJSON files in a ShardedStore.
+OUTPUT_FORMATS = ("files", "ndjson", "ndjson.gz")
+
+INDEX_NAME = "index.ndjson"
+DEFAULT_SHARD_BYTES = 32 << 20
+
+
+class ShardedStore:
+    """Append-only NDJSON shards with an offset index for single-record loads.
+
+    Every put appends the record to the current shard and an index line of
+    [thread_id, shard, offset, length] to index.ndjson, the last line for a thread
+    wins. Deletes append a tombstone with a null shard. Compressed stores write
+    every record as its own gzip member, so a record can still be read on its own
+    and a whole shard is still a valid gzip stream.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        compress: bool = False,
+        shard_bytes: int = DEFAULT_SHARD_BYTES,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.compress = compress
+        self.shard_bytes = shard_bytes
+        self.suffix = ".ndjson.gz" if compress else ".ndjson"
+        # thread id -> (shard, offset, length)
+        self.index: dict[str, tuple[int, int, int]] = {}
+        self.shard = 0
+        self.shard_file: BinaryIO | None = None
+        self.index_file: TextIO | None = None
+        self.load_index()
+
+    @classmethod
+    def for_format(cls, directory: Path, output_format: str) -> "ShardedStore":
+        if output_format not in OUTPUT_FORMATS[1:]:
+            raise ValueError(f"Not a sharded output format: {output_format!r}")
+        return cls(directory, compress=output_format == "ndjson.gz")
+
+    @classmethod
+    def open_existing(cls, directory: Path) -> "ShardedStore":
+        # For loaders, picks the compression the store was written with
+        return cls(directory, compress=any(Path(directory).glob("shard-*.ndjson.gz")))
+
+    def shard_path(self, shard: int) -> Path:
+        return self.directory / f"shard-{shard:05d}{self.suffix}"
+
+    def load_index(self):
+        index_path = self.directory / INDEX_NAME
+        if index_path.exists():
+            with open(index_path, encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        thread_id, shard, offset, length = json.loads(line)
+                    except ValueError:
+                        # Cut short by a crash, the record it points to is unusable
+                        continue
+                    if shard is None:
+                        self.index.pop(thread_id, None)
+                    else:
+                        self.index[thread_id] = (shard, offset, length)
+                        self.shard = max(self.shard, shard)
+
+    def open_for_append(self):
+        if self.shard_file is None:
+            self.shard_file = open(self.shard_path(self.shard), "ab")
+            self.index_file = open(self.directory / INDEX_NAME, "a", encoding="utf-8")
+        if self.shard_file.tell() >= self.shard_bytes:
+            self.shard_file.close()
+            self.shard += 1
+            self.shard_file = open(self.shard_path(self.shard), "ab")
+
+    def encode_text(self, text: str) -> bytes:
+        data = (text + "\n").encode("utf-8")
+        return gzip.compress(data, mtime=0) if self.compress else data
+
+    def encode(self, record: dict) -> bytes:
+        return self.encode_text(json.dumps(record, separators=(",", ":")))
+
+    def decode(self, raw: bytes) -> dict:
+        return json.loads(gzip.decompress(raw) if self.compress else raw)
+
+    def append_index(self, thread_id: str, location: tuple[int, int, int] | None):
+        entry = [thread_id, *(location or (None, None, None))]
+        self.index_file.write(json.dumps(entry) + "\n")
+        # Flushed per record so loaders in other processes see complete entries
+        self.index_file.flush()
+
+    def put_raw(self, thread_id: int | str, raw: bytes):
+        self.open_for_append()
+        offset = self.shard_file.tell()
+        self.shard_file.write(raw)
+        self.shard_file.flush()
+        location = (self.shard, offset, len(raw))
+        self.index[str(thread_id)] = location
+        self.append_index(str(thread_id), location)
+
+    def put(self, thread_id: int | str, record: dict):
+        self.put_raw(thread_id, self.encode(record))
+
+    def put_text(self, thread_id: int | str, text: str):
+        # For records already serialized as compact single-line JSON
+        self.put_raw(thread_id, self.encode_text(text))
+
+    def delete(self, thread_id: int | str):
+        if str(thread_id) not in self.index:
+            return
+        self.open_for_append()
+        del self.index[str(thread_id)]
+        self.append_index(str(thread_id), None)
+
+    def __contains__(self, thread_id: int | str) -> bool:
+        return str(thread_id) in self.index
+
+    def ids(self) -> list[str]:
+        return list(self.index)
+
+    def get_raw(self, thread_id: int | str) -> bytes | None:
+        location = self.index.get(str(thread_id))
+        if location is None:
+            return None
+        shard, offset, length = location
+        with open(self.shard_path(shard), "rb") as file:
+            file.seek(offset)
+            return file.read(length)
+
+    def load(self, thread_id: int | str) -> dict | None:
+        """Reads one record by seeking to it, without reading the rest of the shard."""
+        raw = self.get_raw(thread_id)
+        return None if raw is None else self.decode(raw)
+
+    def copy_from(self, other: "ShardedStore", thread_id: int | str) -> bool:
+        # Carries a record over unchanged, re-encoding only between formats
+        raw = other.get_raw(thread_id)
+        if raw is None:
+            return False
+        if other.compress != self.compress:
+            raw = self.encode(other.decode(raw))
+        self.put_raw(thread_id, raw)
+        return True
+
+    def iter_records(self) -> Iterator[tuple[str, dict]]:
+        # Live records in shard order, each shard is read sequentially once
+        by_shard: dict[int, list[tuple[int, int, str]]] = {}
+        for thread_id, (shard, offset, length) in self.index.items():
+            by_shard.setdefault(shard, []).append((offset, length, thread_id))
+        for shard in sorted(by_shard):
+            with open(self.shard_path(shard), "rb") as file:
+                for offset, length, thread_id in sorted(by_shard[shard]):
+                    file.seek(offset)
+                    yield thread_id, self.decode(file.read(length))
+
+    def close(self):
+        if self.shard_file is not None:
+            self.shard_file.close()
+            self.index_file.close()
+            self.shard_file = self.index_file = None
+
+
+class StringPool:
+    """One shared object per distinct string across the records of a loaded archive.
+
+    Records are decoded one at a time, so the item names, rate intervals, lag
+    conditions, contributors and cdn.tmcc.dev links they repeat are separate
+    objects in every post, and so are their keys. Only worth it for records that
+    stay loaded, the pool itself can be dropped once they are.
+    """
+
+    def __init__(self):
+        self.strings: dict[str, str] = {}
+        self.seen = 0
+
+    def intern(self, value: str) -> str:
+        self.seen += 1
+        return self.strings.setdefault(value, value)
+
+    def intern_record(self, value: object) -> object:
+        # Rebuilds dicts and lists, keys cannot be swapped in place
+        if isinstance(value, str):
+            return self.intern(value)
+        if isinstance(value, dict):
+            return {
+                self.intern(key): self.intern_record(item)
+                for key, item in value.items()
+            }
+        if isinstance(value, list):
+            return [self.intern_record(item) for item in value]
+        return value
+
+
+def iter_archive(directory: Path) -> Iterator[tuple[str, dict]]:
+    # Records of either output layout, a sharded store is recognised by its index
+    directory = Path(directory)
+    if (directory / INDEX_NAME).exists():
+        yield from ShardedStore.open_existing(directory).iter_records()
+        return
+    for path in sorted(directory.glob("*.json")):
+        with open(path, encoding="utf-8") as file:
+            yield path.stem, json.load(file)
+
+
+def load_archive(directory: Path, strings: StringPool | None = None) -> dict[str, dict]:
+    """Every record of a parsed archive by thread id, for workloads that keep it loaded.
+
+    With strings, repeated strings of every record share one object.
+    """
+    if strings is None:
+        return dict(iter_archive(directory))
+    return {
+        strings.intern(thread_id): strings.intern_record(record)
+        for thread_id, record in iter_archive(directory)
+    }
+
+
+def resident_bytes(load: Callable[[], object]) -> tuple[int, object]:
+    # Memory still allocated by load once it returns, everything it dropped is not counted
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        value = load()
+        return tracemalloc.get_traced_memory()[0] - before, value
+    finally:
+        tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(
+        description="Load a parsed archive and report its resident memory with and without string pooling."
+    )
+    argument_parser.add_argument(
+        "--input",
+        default="parsed",
+        help="Parsed output directory, either layout (default: parsed)",
+    )
+    args = argument_parser.parse_args()
+
+    plain_bytes, archive = resident_bytes(lambda: load_archive(args.input))
+    del archive
+    strings = StringPool()
+    pooled_bytes, archive = resident_bytes(lambda: load_archive(args.input, strings))
+    saved = plain_bytes - pooled_bytes
+    print(
+        f"Loaded {len(archive)} posts: {plain_bytes / 1024:.0f} KiB resident, "
+        f"{pooled_bytes / 1024:.0f} KiB with pooled strings and the pool "
+        f"({saved / max(plain_bytes, 1):.0%} saved, "
+        f"{len(strings.strings)} distinct of {strings.seen} strings)"
+    )
@@ -1,23 +1,63 @@
+import argparse
+import heapq
 import json
 import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from contextvars import ContextVar, Token
 
 # import traceback
-from collections import Counter, defaultdict
+from bisect import bisect_left
+from collections import Counter, defaultdict, deque
+from concurrent.futures import Executor, Future
 from functools import wraps
-from typing import Callable
+from itertools import batched, chain, compress, count, repeat
+from typing import Callable, Iterable, Iterator, Sequence, TextIO
 from typing import get_origin
 from dataclasses import dataclass
 
 from MessageDict import Message
+from parsed_store import OUTPUT_FORMATS, ShardedStore
 
-type section = list[str]
+type section = Sequence[str]
 type dict_section = dict[str, section]
 type parser[U] = Callable[[section], U]
 
 
 SCHEMA_DEFAULT_UNSET = object()
 
+# Grammar, every pattern the parser matches with is compiled once here
+LIST_ITEM_RE = re.compile(r"(?P<prefix>- |\d+\. )(?P<text>.*)")
+DISCORD_ID_RE = re.compile(r"<@(\d+)>")
+MD_LINK_RE = re.compile(r"\[([^\]]+)\]\(([^)]+)\)")
+EMPTY_PARENS_RE = re.compile(r"\(\s*\)")
+VERSION_NODE_RE = re.compile(r"\(([^)]+)\)")
+RATE_LINE_RE = re.compile(
+    r"""
+    ^                           # start
+    (?:(\([^)]*\))\s*)?         # Version (optional)
+    (?P<items>[^:(]+?)           # Items
+    (?:\s*\((?P<condition>[^)]*)\))?   # Condition (optional)
+    \s*:\s*
+    (?P<amount>[\d\.]+)(?P<unit>[kKmM]?) # Amount
+    /
+    (?P<interval>[^\s(]+)       # Interval
+    (?:\s*\((?P<note>[^)]*)\))? # Note (optional)
+    \s*$
+    """,
+    re.VERBOSE,
+)
+LAG_ENVIRONMENT_RE = re.compile(
+    r"Test environment: CPU (.*?)( with Lithium)?( in (.*?))?( using (.*))?$"
+)
+LAG_FLAT_ENTRY_RE = re.compile(r"(Idle|Active):\s*([\d\.]+)mspt")
+LAG_LABELLED_ENTRY_RE = re.compile(r"(.*?):\s*([\d\.]+)\s*mspt")
+LAG_BARE_ENTRY_RE = re.compile(r"([\d\.]+)\s*mspt")
+VIDEO_LINK_RE = re.compile(r"\[(.*?)\]\(<(.*?)>\)")
+URL_RE = re.compile(r"(https?://\S+)")
+
 
 CONTRIBUTOR_USERNAME_LOOKUP: ContextVar[dict[int, str] | None] = ContextVar(
     "contributor_username_lookup", default=None
@@ -32,6 +72,125 @@ def reset_contributor_username_lookup(token: Token) -> None:
     CONTRIBUTOR_USERNAME_LOOKUP.reset(token)
 
 
+@dataclass
+class SectionRecord:
+    span: tuple[int, int] | None  # (start, stop) line indexes of the section content
+    content_hash: int
+    value: object
+
+
+# Field name -> last parse of that "## " section, lets an edited post re-parse only the sections that changed
+SECTION_CACHE: ContextVar[dict[str, SectionRecord] | None] = ContextVar(
+    "section_cache", default=None
+)
+
+
+# Top level fields message_parse should run the sub-parsers of, None for all of them
+FIELD_SELECTION: ContextVar[frozenset[str] | None] = ContextVar(
+    "field_selection", default=None
+)
+
+MESSAGE_FIELDS = frozenset(Message.__annotations__)
+
+# When set, recoverable parse errors are appended here and parsing carries on with defaults
+ERROR_COLLECTOR: ContextVar[list["ParseError"] | None] = ContextVar(
+    "error_collector", default=None
+)
+
+
+def set_section_cache(cache: dict[str, SectionRecord] | None) -> Token:
+    return SECTION_CACHE.set(cache)
+
+
+def reset_section_cache(token: Token) -> None:
+    SECTION_CACHE.reset(token)
+
+
+class FieldTiming:
+    __slots__ = ("calls", "total_ns", "max_ns")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+
+class ParseProfile:
+    """Call count, total and maximum time of each top level field parser, plus the time of each post."""
+
+    def __init__(self):
+        self.fields: dict[str, FieldTiming] = {}
+        self.posts: list[tuple[int, str]] = []  # (elapsed_ns, label)
+
+    def record_field(self, name: str, elapsed_ns: int) -> None:
+        timing = self.fields.get(name)
+        if timing is None:
+            timing = self.fields[name] = FieldTiming()
+        timing.calls += 1
+        timing.total_ns += elapsed_ns
+        timing.max_ns = max(timing.max_ns, elapsed_ns)
+
+    def record_post(self, label: str, elapsed_ns: int) -> None:
+        self.posts.append((elapsed_ns, label))
+
+    def merge(self, other: "ParseProfile") -> None:
+        for name, timing in other.fields.items():
+            own = self.fields.get(name)
+            if own is None:
+                own = self.fields[name] = FieldTiming()
+            own.calls += timing.calls
+            own.total_ns += timing.total_ns
+            own.max_ns = max(own.max_ns, timing.max_ns)
+        self.posts.extend(other.posts)
+
+    def slowest_fields(self, limit: int) -> list[tuple[str, FieldTiming]]:
+        # By total time, the fields worth optimising first
+        return heapq.nlargest(
+            limit, self.fields.items(), key=lambda item: item[1].total_ns
+        )
+
+    def slowest_posts(self, limit: int) -> list[tuple[int, str]]:
+        return heapq.nlargest(limit, self.posts)
+
+
+# When set, message_parse runs the profiled copy of the schema and records field timings here
+PARSE_PROFILE: ContextVar[ParseProfile | None] = ContextVar(
+    "parse_profile", default=None
+)
+
+
+def set_parse_profile(profile: ParseProfile | None) -> Token:
+    return PARSE_PROFILE.set(profile)
+
+
+def reset_parse_profile(token: Token) -> None:
+    PARSE_PROFILE.reset(token)
+
+
+class ParseError(ValueError):
+    """A parse failure tied to the schema field path and line span of the post it came from."""
+
+    def __init__(
+        self,
+        message: str,
+        path: str = "",
+        span: tuple[int, int] | None = None,
+        kind: str | None = None,
+    ):
+        super().__init__(message)
+        self.path = path
+        self.span = span
+        # Name of the exception this one wraps, so reports show the original type
+        self.kind = kind or type(self).__name__
+
+    def __reduce__(self):
+        return type(self), (str(self), self.path, self.span, self.kind)
+
+
+def error_kind(error: Exception) -> str:
+    return error.kind if isinstance(error, ParseError) else type(error).__name__
+
+
 @dataclass
 class SchemaItem[T]:
     display_names: list[str]
@@ -41,7 +200,9 @@ class SchemaItem[T]:
     default: T | None | object = SCHEMA_DEFAULT_UNSET
 
 
-@dataclass
+# Parse results are slotted objects instead of dicts, repeated strings in them are
+# interned. to_dict gives the MessageDict shape, only needed when writing them out.
+@dataclass(slots=True)
 class ListNode:
     text: str
     children: list["ListNode"]
@@ -55,8 +216,98 @@ class ListNode:
         }
 
 
-def serialize_nodes(nodes: list[ListNode]) -> list[dict]:
-    return [n.to_dict() for n in nodes]
+@dataclass(slots=True)
+class Contributor:
+    id: str
+    name: str
+    channel_link: str
+    contribution: str
+    contribution_link: str
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "channel_link": self.channel_link,
+            "contribution": self.contribution,
+            "contribution_link": self.contribution_link,
+        }
+
+
+@dataclass(slots=True)
+class Rate:
+    variants: tuple[str, ...]  # Shared by every rate under the same variant nodes
+    version: str
+    item_type: str  # "concurrent" | "exclusive"
+    item_names: tuple[str, ...]
+    conditions: str
+    amount: float
+    interval: str
+    note: str
+
+    def to_dict(self) -> dict:
+        return {
+            "variants": list(self.variants),
+            "version": self.version,
+            "items": {"type": self.item_type, "names": list(self.item_names)},
+            "conditions": self.conditions,
+            "amount": self.amount,
+            "interval": self.interval,
+            "note": self.note,
+        }
+
+
+@dataclass(slots=True)
+class LagEntry:
+    conditions: tuple[str, ...]
+    lag: float
+
+    def to_dict(self) -> dict:
+        return {"conditions": list(self.conditions), "lag": self.lag}
+
+
+@dataclass(slots=True)
+class FileNode:
+    name: str
+    url: str
+    note: str
+
+    def to_dict(self) -> dict:
+        return {"type": "file", "name": self.name, "url": self.url, "note": self.note}
+
+
+@dataclass(slots=True)
+class FolderNode:
+    name: str
+    children: list["FileNode | FolderNode"]
+
+    def to_dict(self) -> dict:
+        return {
+            "type": "folder",
+            "name": self.name,
+            "children": [c.to_dict() for c in self.children],
+        }
+
+
+RESULT_TYPES = (ListNode, Contributor, Rate, LagEntry, FileNode, FolderNode)
+
+
+def json_default(value: object) -> dict:
+    # Passed as json.dump(s) default=, result objects are converted as they are written
+    if isinstance(value, RESULT_TYPES):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def materialize(value: object) -> object:
+    """Converts a parse result to plain dicts and lists, for non-json consumers."""
+    if isinstance(value, RESULT_TYPES):
+        return value.to_dict()
+    if isinstance(value, dict):
+        return {key: materialize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [materialize(item) for item in value]
+    return value
 
 
 def identity[T](x: T) -> T:
@@ -106,18 +357,99 @@ def dict_postprocess_parse[T](
     return lambda data: {k: postprocessor(v) for k, v in parser_(data).items()}
 
 
-def prefix_dict_parse(
-    prefix: str,
-) -> parser[dict_section]:
-    def parse(data: section) -> dict_section:
-        parsed_data: defaultdict[str, section] = defaultdict(list)
+HEADING_PREFIXES = {1: "# ", 2: "## ", 3: "### "}
+
+
+class SectionIndex:
+    """Heading positions of a post's lines, found in a single pass."""
+
+    __slots__ = ("lines", "headings")
+
+    def __init__(self, lines: Sequence[str]):
+        self.lines = lines
+        # Heading level -> sorted indexes of the lines with that heading prefix
+        self.headings: dict[int, list[int]] = {level: [] for level in HEADING_PREFIXES}
+        # Only lines starting with "#" are looked at in Python, the scan itself runs in C
+        for i in compress(count(), map(str.startswith, lines, repeat("#"))):
+            line = lines[i]
+            for level, prefix in HEADING_PREFIXES.items():
+                if line.startswith(prefix):
+                    self.headings[level].append(i)
+                    break
+
+
+class SectionView(Sequence[str]):
+    """Lines of a section as (start, stop) spans into the post's line list, without copying them."""
+
+    __slots__ = ("index", "spans")
+
+    def __init__(self, index: SectionIndex, spans: list[tuple[int, int]]):
+        self.index = index
+        self.spans = spans
+
+    @classmethod
+    def of(cls, lines: section) -> "SectionView":
+        if isinstance(lines, SectionView):
+            return lines
+        return cls(SectionIndex(lines), [(0, len(lines))])
+
+    def __len__(self) -> int:
+        return sum(stop - start for start, stop in self.spans)
+
+    def __iter__(self) -> Iterator[str]:
+        get_line = self.index.lines.__getitem__
+        if len(self.spans) == 1:
+            start, stop = self.spans[0]
+            return map(get_line, range(start, stop))
+        return chain.from_iterable(
+            map(get_line, range(start, stop)) for start, stop in self.spans
+        )
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self)[i]
+        if i < 0:
+            i += len(self)
+        for start, stop in self.spans:
+            if i < stop - start:
+                return self.index.lines[start + i]
+            i -= stop - start
+        raise IndexError("section index out of range")
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    @property
+    def span(self) -> tuple[int, int] | None:
+        if not self.spans:
+            return None
+        return self.spans[0][0], self.spans[-1][1]
+
+    def split(self, level: int) -> dict[str, "SectionView"]:
+        # Lines are grouped under the last heading of this level before them, lines before
+        # the first heading go under "". Only heading lines are visited
+        headings = self.index.headings[level]
+        prefix_length = len(HEADING_PREFIXES[level])
+        lines = self.index.lines
+        sections: dict[str, list[tuple[int, int]]] = {}
         current_key = ""
-        for line in data:
-            if line.startswith(prefix):
-                current_key = line[len(prefix) :].strip()
-            else:
-                parsed_data[current_key].append(line)
-        return dict(parsed_data)
+        for start, stop in self.spans:
+            cursor = start
+            for heading in headings[
+                bisect_left(headings, start) : bisect_left(headings, stop)
+            ]:
+                if heading > cursor:
+                    sections.setdefault(current_key, []).append((cursor, heading))
+                current_key = lines[heading][prefix_length:].strip()
+                cursor = heading + 1
+            if stop > cursor:
+                sections.setdefault(current_key, []).append((cursor, stop))
+        return {key: SectionView(self.index, spans) for key, spans in sections.items()}
+
+
+def heading_dict_parse(level: int) -> parser[dict[str, SectionView]]:
+    def parse(data: section) -> dict[str, SectionView]:
+        return SectionView.of(data).split(level)
 
     return parse
 
@@ -140,52 +472,35 @@ def flattened_list_parse() -> parser[section]:
     return parse
 
 
-def parse_nested_list(data: list[str], indent: int = 0) -> list[ListNode]:
+def parse_nested_list(data: section, indent: int = 0) -> list[ListNode]:
     nodes: list[ListNode] = []
-    i = 0
+    # Open items as (indent, children), innermost last. A line belongs to the
+    # innermost open item that is indented less than it, closing any others
+    stack: list[tuple[int, list[ListNode]]] = []
 
-    while i < len(data):
-        line = data[i]
+    for line in data:
         stripped = line.lstrip()
         current_indent = len(line) - len(stripped)
 
-        if current_indent < indent:
-            i += 1
+        while stack and current_indent <= stack[-1][0]:
+            stack.pop()
+
+        # Children have to be indented at least two past their parent
+        min_indent = stack[-1][0] + 2 if stack else indent
+        if current_indent < min_indent:
             continue
 
-        LIST_ITEM_RE = re.compile(r"(?P<prefix>- |\d+\. )(?P<text>.*)")
         m = LIST_ITEM_RE.match(stripped)
         if not m:
-            i += 1
             continue
 
-        prefix = m.group("prefix")
-        text = m.group("text").strip()
-
-        list_type = "dashed" if prefix == "- " else "numbered"
-
-        i += 1
-
-        # collect children
-        children_lines = []
-        while i < len(data):
-            next_line = data[i]
-            next_stripped = next_line.lstrip()
-            next_indent = len(next_line) - len(next_stripped)
-
-            if next_indent <= current_indent:
-                break
-
-            children_lines.append(next_line)
-            i += 1
-
-        nodes.append(
-            ListNode(
-                text=text,
-                list_type=list_type,
-                children=parse_nested_list(children_lines, current_indent + 2),
-            )
+        node = ListNode(
+            text=m.group("text").strip(),
+            list_type="dashed" if m.group("prefix") == "- " else "numbered",
+            children=[],
         )
+        (stack[-1][1] if stack else nodes).append(node)
+        stack.append((current_indent, node.children))
 
     return nodes
 
@@ -212,50 +527,183 @@ def list_dict_parse() -> parser[dict_section]:
     return parse
 
 
+def schema_default_factory(field: SchemaItem) -> Callable[[], object]:
+    # Resolved once when the schema is built rather than on every missing field
+    if field.default is not SCHEMA_DEFAULT_UNSET:
+        default = field.default
+        return lambda: default
+
+    # Even more sensible empty defaults
+    origin = get_origin(field.parser.__annotations__.get("return", None))
+    if origin is list:
+        return list
+    elif origin is dict:
+        return dict
+    return str
+
+
+def section_span(data: section) -> tuple[int, int] | None:
+    return data.span if isinstance(data, SectionView) else None
+
+
+def locate_error(error: "ParseError", name: str, data: section) -> "ParseError":
+    # Errors bubble up through nested schemas, each level prefixes its field name
+    error.path = f"{name}.{error.path}" if error.path else name
+    if error.span is None:
+        error.span = section_span(data)
+    return error
+
+
+def collect_or_raise(error: "ParseError") -> None:
+    collector = ERROR_COLLECTOR.get()
+    if collector is None:
+        raise error
+    collector.append(error)
+
+
+def schema_field_parse[T](
+    name: str,
+    field_parser: parser[T],
+    data: section,
+    section_cache: dict[str, SectionRecord] | None,
+    default_factory: Callable[[], T],
+) -> T:
+    if section_cache is not None:
+        content_hash = hash(tuple(data))
+        record = section_cache.get(name)
+        if record is not None and record.content_hash == content_hash:
+            # Unchanged section, only its position in the post may have moved
+            record.span = section_span(data)
+            return record.value
+
+    collector = ERROR_COLLECTOR.get()
+    collected = len(collector) if collector is not None else 0
+    try:
+        value = field_parser(data)
+    except ParseError as e:
+        collect_or_raise(locate_error(e, name, data))
+        return default_factory()
+    except Exception as e:
+        error = ParseError(str(e), name, section_span(data), type(e).__name__)
+        error.__cause__ = e
+        collect_or_raise(error)
+        return default_factory()
+
+    if collector is not None and len(collector) > collected:
+        # Errors recovered inside a nested schema, the partial value is not cached
+        for error in collector[collected:]:
+            locate_error(error, name, data)
+        return value
+
+    if section_cache is not None:
+        section_cache[name] = SectionRecord(section_span(data), content_hash, value)
+    return value
+
+
+def profiled_field_parse[T](name: str, field_parser: parser[T]) -> parser[T]:
+    # Applied when a profiled schema is built, the plain schema never pays for the timing
+    @wraps(field_parser)
+    def parse(data: section) -> T:
+        start = time.perf_counter_ns()
+        try:
+            return field_parser(data)
+        finally:
+            profile = PARSE_PROFILE.get()
+            if profile is not None:
+                profile.record_field(name, time.perf_counter_ns() - start)
+
+    return parse
+
+
 def schema_dict_parse[T](
     parser_: parser[dict_section],
     config: list[SchemaItem],
+    top_level: bool = False,
+    profiled: bool = False,
 ) -> parser[dict[str, T]]:
+    # The top level schema holds the post's "## " fields, which support section caching and field selection.
+    # Compiled once at import: flat dispatch entries with resolved defaults,
+    # and every recognised display name for the extra fields check
+    fields = [
+        (
+            field.name,
+            tuple(field.display_names),
+            (
+                profiled_field_parse(field.name, field.parser)
+                if profiled
+                else field.parser
+            ),
+            field.required,
+            schema_default_factory(field),
+        )
+        for field in config
+    ]
+    known_names = frozenset(
+        display_name for field in config for display_name in field.display_names
+    )
+
     def parse(data: section) -> dict:
         result: dict[str, T] = {}
         parsed_data = parser_(data)
+        section_cache = SECTION_CACHE.get() if top_level else None
+        selection = FIELD_SELECTION.get() if top_level else None
 
-        used_keys = set()
-
-        for field in config:
-            match_found = False
-            for display_name in field.display_names:
+        matched = 0
+        for name, display_names, field_parser, required, default_factory in fields:
+            selected = selection is None or name in selection
+            for display_name in display_names:
                 if display_name in parsed_data:
-                    result[field.name] = field.parser(parsed_data[display_name])
-                    used_keys.add(display_name)
-                    match_found = True
+                    # Unselected fields are still checked for presence, but not parsed
+                    if selected:
+                        result[name] = schema_field_parse(
+                            name,
+                            field_parser,
+                            parsed_data[display_name],
+                            section_cache,
+                            default_factory,
+                        )
+                    matched += 1
                     break
-            if not match_found:
-                if field.required:
-                    raise ValueError(
-                        f"Required field **{field.name}** not found in the section."
+            else:
+                if required:
+                    collect_or_raise(
+                        ParseError(
+                            f"Required field **{name}** not found in the section.",
+                            name,
+                            section_span(data),
+                        )
                     )
-                else:
-                    # Even more sensible empty defaults
-                    if field.default is not SCHEMA_DEFAULT_UNSET:
-                        result[field.name] = field.default
-                    else:
-                        return_type = field.parser.__annotations__.get("return", None)
-                        origin = get_origin(return_type)
-
-                        if origin is list:
-                            result[field.name] = []
-                        elif origin is dict:
-                            result[field.name] = {}
-                        else:
-                            result[field.name] = ""
-
-        extra_keys = set(parsed_data.keys()) - used_keys
-        if extra_keys:
+                if section_cache is not None:
+                    section_cache.pop(name, None)
+                if selected:
+                    result[name] = default_factory()
+
+        # Every key besides the untitled preamble was consumed by exactly one field
+        if len(parsed_data) - ("" in parsed_data) != matched:
+            extra_keys = parsed_data.keys() - known_names
             extra_keys.discard("")
-            if extra_keys:
-                raise ValueError(
-                    f"Extra or unrecognised fields found: {', '.join(extra_keys)}"
+            # Aliases left over when a section uses more than one display name of a field
+            for _, display_names, *_ in fields:
+                present = [n for n in display_names if n in parsed_data]
+                extra_keys.update(present[1:])
+            ordered_extra_keys = sorted(
+                extra_keys, key=lambda key: section_span(parsed_data[key]) or (0, 0)
+            )
+            collector = ERROR_COLLECTOR.get()
+            if collector is not None:
+                collector.extend(
+                    ParseError(
+                        f"Extra or unrecognised fields found: {key}",
+                        key,
+                        section_span(parsed_data[key]),
+                    )
+                    for key in ordered_extra_keys
+                )
+            elif extra_keys:
+                raise ParseError(
+                    f"Extra or unrecognised fields found: {', '.join(extra_keys)}",
+                    ordered_extra_keys[0],
+                    section_span(parsed_data[ordered_extra_keys[0]]),
                 )
 
         return result
@@ -309,10 +757,7 @@ def version_parse() -> parser[dict[str, str]]:
     return parse
 
 
-def contributors_parse() -> parser[list[dict[str, str | int]]]:
-    DISCORD_ID_RE = re.compile(r"<@(\d+)>")
-    MD_LINK_RE = re.compile(r"\[([^\]]+)\]\(([^)]+)\)")
-
+def contributors_parse() -> parser[list[Contributor]]:
     def parse_contributor(text: str) -> dict:
         result = {
             "id": "",
@@ -321,7 +766,7 @@ def contributors_parse() -> parser[list[dict[str, str | int]]]:
         }
 
         # Discord ID
-        id_match = DISCORD_ID_RE.search(text)
+        id_match = DISCORD_ID_RE.search(text) if "<@" in text else None
         if id_match:
             result["id"] = id_match.group(1)
 
@@ -334,12 +779,12 @@ def contributors_parse() -> parser[list[dict[str, str | int]]]:
             text = DISCORD_ID_RE.sub("", text)
 
             # Remove empty parentheses
-            text = re.sub(r"\(\s*\)", "", text)
+            text = EMPTY_PARENS_RE.sub("", text)
 
         text = text.strip()
 
         # Name + channel
-        link_match = MD_LINK_RE.search(text)
+        link_match = MD_LINK_RE.search(text) if "](" in text else None
         if link_match:
             result["name"] = link_match.group(1).strip()
             result["channel_link"] = normalize_cdn_url(link_match.group(2).strip("<>"))
@@ -358,7 +803,7 @@ def contributors_parse() -> parser[list[dict[str, str | int]]]:
             "contribution_link": "",
         }
 
-        link_match = MD_LINK_RE.search(text)
+        link_match = MD_LINK_RE.search(text) if "](" in text else None
         if link_match:
             result["contribution"] = link_match.group(1).strip()
             result["contribution_link"] = normalize_cdn_url(
@@ -370,7 +815,7 @@ def contributors_parse() -> parser[list[dict[str, str | int]]]:
         return result
 
     @single_line_parser
-    def parse(data: str) -> list[dict[str, str | int]]:
+    def parse(data: str) -> list[Contributor]:
         text = data
 
         # Remove leading "- "
@@ -394,17 +839,17 @@ def contributors_parse() -> parser[list[dict[str, str | int]]]:
         contributions = [parse_contribution(c) for c in contribution_chunks]
 
         # Cartesian product # ai made that comment but it sounded smart so i kept it
-        results: list[dict[str, str | int]] = []
+        results: list[Contributor] = []
         for c in contributors:
             for contrib in contributions:
                 results.append(
-                    {
-                        "id": c["id"],
-                        "name": c["name"],
-                        "channel_link": c["channel_link"],
-                        "contribution": contrib["contribution"],
-                        "contribution_link": contrib["contribution_link"],
-                    }
+                    Contributor(
+                        c["id"],
+                        c["name"],
+                        c["channel_link"],
+                        contrib["contribution"],
+                        contrib["contribution_link"],
+                    )
                 )
 
         return results
@@ -420,13 +865,13 @@ def rates_section_parser() -> parser[dict]:
             "notes": [],
         }
 
-        sections = prefix_dict_parse("### ")(data)
+        sections = heading_dict_parse(3)(data)
 
         drops_data = sections.get("", [])
         if drops_data:
             walk_rates(
                 parse_nested_list(drops_data),
-                [],
+                (),
                 None,  # no version at top level
                 result["drops"],
             )
@@ -434,39 +879,31 @@ def rates_section_parser() -> parser[dict]:
         if "Consumes" in sections:
             walk_rates(
                 parse_nested_list(sections["Consumes"]),
-                [],
+                (),
                 None,
                 result["consumption"],
             )
 
         if "Notes" in sections:
-            result["notes"] = serialize_nodes(parse_nested_list(sections["Notes"]))
+            result["notes"] = parse_nested_list(sections["Notes"])
 
         return result
 
     return parse
 
 
-def parse_rate_line(text: str):
+def parse_rate_line(
+    text: str, variants: tuple[str, ...] = (), version: str = ""
+) -> Rate:
     """
     - Variant:
       - (Version) Items (Condition): Amount/Interval (Note)
+
+    A version in the line itself takes precedence over the one passed in.
     """
-    RATE_LINE_RE = re.compile(
-        r"""
-        ^                           # start
-        (?:(\([^)]*\))\s*)?         # Version (optional)
-        (?P<items>[^:(]+?)           # Items
-        (?:\s*\((?P<condition>[^)]*)\))?   # Condition (optional)
-        \s*:\s*
-        (?P<amount>[\d\.]+)(?P<unit>[kKmM]?) # Amount
-        /
-        (?P<interval>[^\s(]+)       # Interval
-        (?:\s*\((?P<note>[^)]*)\))? # Note (optional)
-        \s*$
-        """,
-        re.VERBOSE,
-    )
+    # Cheap rejection before running the full pattern, both separators are mandatory
+    if ":" not in text or "/" not in text:
+        raise ValueError(f"Invalid rate line: {text!r}")
 
     m = RATE_LINE_RE.match(text)
     if not m:
@@ -479,30 +916,35 @@ def parse_rate_line(text: str):
         "m": 1e6,
     }[m.group("unit").lower()]
 
-    version = (m.group(1) or "").strip("()")
     items = parse_drop_field()([m.group("items").strip()])
 
-    return {
-        "version": version,
-        "items": items,
-        "conditions": m.group("condition") or "",
-        "amount": float(amount * unit),
-        "interval": m.group("interval"),
-        "note": m.group("note") or "",
-    }
+    return Rate(
+        variants,
+        (m.group(1) or "").strip("()") or version,
+        items["type"],
+        tuple(items["names"]),
+        m.group("condition") or "",
+        float(amount * unit),
+        sys.intern(m.group("interval")),
+        m.group("note") or "",
+    )
 
 
 def walk_rates(
     nodes: list[ListNode],
-    variants: list[str],
+    variants: tuple[str, ...],
     version: str | None,
-    out: list[dict],
+    out: list[Rate],
 ):
     for node in nodes:
         text = node.text.strip()
 
         # Version-only node "(1.21.2+)"
-        version_match = re.fullmatch(r"\(([^)]+)\)", text)
+        version_match = (
+            VERSION_NODE_RE.fullmatch(text)
+            if text.startswith("(") and text.endswith(")")
+            else None
+        )
         if version_match:
             walk_rates(
                 node.children,
@@ -516,26 +958,14 @@ def walk_rates(
         if text.endswith(":"):
             walk_rates(
                 node.children,
-                variants + [text.rstrip(":").strip()],
+                (*variants, sys.intern(text.rstrip(":").strip())),
                 version,
                 out,
             )
             continue
 
         # Leaf rate entry
-        rate_data = parse_rate_line(text)
-
-        out.append(
-            {
-                "variants": variants.copy(),
-                "version": rate_data["version"] or (version or ""),
-                "items": rate_data["items"],
-                "conditions": rate_data["conditions"],
-                "amount": rate_data["amount"],
-                "interval": rate_data["interval"],
-                "note": rate_data["note"],
-            }
-        )
+        out.append(parse_rate_line(text, variants, version or ""))
 
 
 def parse_drop_field() -> parser[dict[str, list[str] | str]]:
@@ -543,13 +973,13 @@ def parse_drop_field() -> parser[dict[str, list[str] | str]]:
     def parse(data: str) -> dict[str, list[str] | str]:
         text = data.strip()
         if "/" in text:
-            item_names = [x.strip() for x in text.split("/")]
+            item_names = [sys.intern(x.strip()) for x in text.split("/")]
             _type = "exclusive"
         elif "," in text:
-            item_names = [x.strip() for x in text.split(",")]
+            item_names = [sys.intern(x.strip()) for x in text.split(",")]
             _type = "concurrent"
         else:
-            item_names = [text]
+            item_names = [sys.intern(text)]
             _type = "concurrent"  # single drop can be treated as concurrent
         return {"type": _type, "names": item_names}
 
@@ -567,7 +997,7 @@ def parse_lag_section(data: section) -> dict:
     default_variant = ""
 
     # Split by ### headers
-    sections = prefix_dict_parse("### ")(data)
+    sections = heading_dict_parse(3)(data)
 
     # Main lines
     main_lines = sections.get("", [])
@@ -578,10 +1008,7 @@ def parse_lag_section(data: section) -> dict:
 
         # Environment
         if text.startswith("Test environment: CPU"):
-            m = re.match(
-                r"Test environment: CPU (.*?)( with Lithium)?( in (.*?))?( using (.*))?$",
-                text,
-            )
+            m = LAG_ENVIRONMENT_RE.match(text)
             if m:
                 result["environment"]["cpu"] = m.group(1)
                 result["environment"]["has_lithium"] = bool(m.group(2))
@@ -590,61 +1017,61 @@ def parse_lag_section(data: section) -> dict:
             continue
 
         # Flat lag entries
-        m = re.match(r"(Idle|Active):\s*([\d\.]+)mspt", text)
+        m = LAG_FLAT_ENTRY_RE.match(text) if "mspt" in text else None
         if m:
             section_name = m.group(1).lower()
             lag = float(m.group(2))
             result[section_name].append(
-                {"conditions": [default_variant] if default_variant else [], "lag": lag}
+                LagEntry((default_variant,) if default_variant else (), lag)
             )
             continue
 
         # Nested entries
         key = node.text.lower().rstrip(":").strip()
         if key in result:
-            walk_lag(node.children, [], result[key], default_variant=default_variant)
+            walk_lag(node.children, (), result[key], default_variant=default_variant)
 
     # Notes
     if "Notes" in sections:
         notes_lines = sections["Notes"]
-        result["notes"] = serialize_nodes(parse_nested_list(notes_lines))
+        result["notes"] = parse_nested_list(notes_lines)
 
     return result
 
 
 def walk_lag(nodes, conditions, out, default_variant=""):
     for node in nodes:
-        # Match "Label: 6mspt"
-        m = re.match(r"(.*?):\s*([\d\.]+)\s*mspt", node.text)
-        if m:
-            label = m.group(1).strip()
-            lag = float(m.group(2))
-            # Use label as condition if present, otherwise default_variant
-            conds = [label] if label else ([default_variant] if default_variant else [])
-            out.append(
-                {
-                    "conditions": conditions + conds,
-                    "lag": lag,
-                }
-            )
-            continue
+        # Both entry forms need a "mspt" unit, anything else is variant context
+        if "mspt" in node.text:
+            # Match "Label: 6mspt"
+            m = LAG_LABELLED_ENTRY_RE.match(node.text)
+            if m:
+                label = m.group(1).strip()
+                lag = float(m.group(2))
+                # Use label as condition if present, otherwise default_variant
+                conds = (
+                    (label,)
+                    if label
+                    else ((default_variant,) if default_variant else ())
+                )
+                out.append(LagEntry(conditions + conds, lag))
+                continue
 
-        # Match bare "6mspt"
-        lag_match = re.search(r"([\d\.]+)\s*mspt", node.text)
-        if lag_match:
-            out.append(
-                {
-                    "conditions": conditions
-                    + ([default_variant] if default_variant else []),
-                    "lag": float(lag_match.group(1)),
-                }
-            )
-            continue
+            # Match bare "6mspt"
+            lag_match = LAG_BARE_ENTRY_RE.search(node.text)
+            if lag_match:
+                out.append(
+                    LagEntry(
+                        conditions + ((default_variant,) if default_variant else ()),
+                        float(lag_match.group(1)),
+                    )
+                )
+                continue
 
         # Otherwise, descend and treat this node as variant context
         walk_lag(
             node.children,
-            conditions + [node.text.rstrip(":")],
+            (*conditions, node.text.rstrip(":")),
             out,
             default_variant=default_variant,
         )
@@ -659,7 +1086,7 @@ def videos_parse() -> parser[list[dict[str, str]]]:
 
             text = line[2:].strip()
 
-            m = re.match(r"\[(.*?)\]\(<(.*?)>\)", text)
+            m = VIDEO_LINK_RE.match(text)
             if not m:
                 raise ValueError(f"Invalid video link format: {data!r}")
 
@@ -675,11 +1102,11 @@ def videos_parse() -> parser[list[dict[str, str]]]:
     return parse
 
 
-def files_from_nodes(nodes: list[ListNode]) -> list[dict]:
-    result = []
+def files_from_nodes(nodes: list[ListNode]) -> list[FileNode | FolderNode]:
+    result: list[FileNode | FolderNode] = []
 
     for node in nodes:
-        urls = re.findall(r"(https?://\S+)", node.text)
+        urls = URL_RE.findall(node.text) if "http" in node.text else []
 
         if urls:
             # Note only applies if there's exactly one file
@@ -690,20 +1117,15 @@ def files_from_nodes(nodes: list[ListNode]) -> list[dict]:
             for url in urls:
                 normalized_url = normalize_cdn_url(url)
                 result.append(
-                    {
-                        "type": "file",
-                        "name": normalized_url.split("/")[-1],
-                        "url": normalized_url,
-                        "note": note if len(urls) == 1 else "",
-                    }
+                    FileNode(
+                        normalized_url.split("/")[-1],
+                        normalized_url,
+                        note if len(urls) == 1 else "",
+                    )
                 )
         else:
             result.append(
-                {
-                    "type": "folder",
-                    "name": node.text.rstrip(":"),
-                    "children": files_from_nodes(node.children),
-                }
+                FolderNode(node.text.rstrip(":"), files_from_nodes(node.children))
             )
 
     return result
@@ -718,7 +1140,7 @@ def figures_parse() -> parser[list[dict]]:
             if not stripped.startswith("- "):
                 continue
 
-            urls = re.findall(r"(https?://\S+)", stripped)
+            urls = URL_RE.findall(stripped) if "http" in stripped else []
             for url in urls:
                 normalized_url = normalize_cdn_url(url)
                 figures.append(
@@ -733,258 +1155,545 @@ def figures_parse() -> parser[list[dict]]:
     return parse
 
 
-message_parse_schema = dict_postprocess_parse(
-    prefix_dict_parse("# "),
-    schema_dict_parse(
-        prefix_dict_parse("## "),
-        [
-            SchemaItem(
-                ["Designer", "Designers", "Designer(s)"],
-                "designers",
-                list_postprocess_flattened_parse(list_parse(), contributors_parse()),
-                required=False,
-                default=[],
-            ),
-            SchemaItem(
-                ["Credits", "Credit"],
-                "credits",
-                list_postprocess_flattened_parse(list_parse(), contributors_parse()),
-                required=False,
-                default=[],
-            ),
-            SchemaItem(["Versions"], "versions", version_parse()),
-            SchemaItem(
-                ["Rates"],
-                "rates",
-                rates_section_parser(),
-                required=False,
-                default={"drops": [], "consumption": [], "notes": []},
-            ),
-            SchemaItem(
-                ["Lag Info"],
-                "lag_info",
-                parse_lag_section,  # Pass the section directly
-                required=False,
-                default=None,
-            ),
-            SchemaItem(
-                ["Video Links", "Video Link"],
-                "video_links",
-                videos_parse(),
-                required=False,
-                default=[],
-            ),
-            SchemaItem(
-                ["Files"],
-                "files",
-                schema_dict_parse(
-                    list_dict_parse(),  # Schematics / World Downloads / Images
-                    [
-                        SchemaItem(
-                            ["Schematic", "Schematics"],
-                            "schematics",
-                            lambda data: files_from_nodes(parse_nested_list(data)),
-                        ),
-                        SchemaItem(
-                            ["World Download", "World Downloads"],
-                            "world_downloads",
-                            lambda data: files_from_nodes(parse_nested_list(data)),
-                            required=False,
-                            default=[],
-                        ),
-                        SchemaItem(
-                            ["Image", "Images"],
-                            "images",
-                            lambda data: files_from_nodes(parse_nested_list(data)),
-                        ),
-                    ],
+# The "## " fields of a post, module level so tools can reach the individual field parsers
+MESSAGE_SCHEMA: list[SchemaItem] = [
+    SchemaItem(
+        ["Designer", "Designers", "Designer(s)"],
+        "designers",
+        list_postprocess_flattened_parse(list_parse(), contributors_parse()),
+        required=False,
+        default=[],
+    ),
+    SchemaItem(
+        ["Credits", "Credit"],
+        "credits",
+        list_postprocess_flattened_parse(list_parse(), contributors_parse()),
+        required=False,
+        default=[],
+    ),
+    SchemaItem(["Versions"], "versions", version_parse()),
+    SchemaItem(
+        ["Rates"],
+        "rates",
+        rates_section_parser(),
+        required=False,
+        default={"drops": [], "consumption": [], "notes": []},
+    ),
+    SchemaItem(
+        ["Lag Info"],
+        "lag_info",
+        parse_lag_section,  # Pass the section directly
+        required=False,
+        default=None,
+    ),
+    SchemaItem(
+        ["Video Links", "Video Link"],
+        "video_links",
+        videos_parse(),
+        required=False,
+        default=[],
+    ),
+    SchemaItem(
+        ["Files"],
+        "files",
+        schema_dict_parse(
+            list_dict_parse(),  # Schematics / World Downloads / Images
+            [
+                SchemaItem(
+                    ["Schematic", "Schematics"],
+                    "schematics",
+                    lambda data: files_from_nodes(parse_nested_list(data)),
                 ),
-            ),
-            SchemaItem(
-                ["Description"],
-                "description",
-                lambda data: serialize_nodes(parse_nested_list(data)),
-            ),
-            SchemaItem(
-                ["Positives"],
-                "positives",
-                lambda data: serialize_nodes(parse_nested_list(data)),
-                required=False,
-                default=[],
-            ),
-            SchemaItem(
-                ["Negatives"],
-                "negatives",
-                lambda data: serialize_nodes(parse_nested_list(data)),
-                required=False,
-                default=[],
-            ),
-            SchemaItem(
-                ["Design Specifications"],
-                "design_specifications",
-                lambda data: serialize_nodes(parse_nested_list(data)),
-                required=False,
-                default=[],
-            ),
-            SchemaItem(
-                ["Instructions"],
-                "instructions",
-                schema_dict_parse(
-                    prefix_dict_parse("### "),
-                    [
-                        SchemaItem(
-                            ["Notes"],
-                            "notes",
-                            lambda data: serialize_nodes(parse_nested_list(data)),
-                            required=False,
-                            default=[],
-                        ),
-                        SchemaItem(
-                            ["Build"],
-                            "build",
-                            lambda data: serialize_nodes(parse_nested_list(data)),
-                            required=False,
-                            default=[],
-                        ),
-                        SchemaItem(
-                            ["How to Use", "How to use", "Usage"],
-                            "usage",
-                            lambda data: serialize_nodes(parse_nested_list(data)),
-                            required=False,
-                            default=[],
-                        ),
-                    ],
+                SchemaItem(
+                    ["World Download", "World Downloads"],
+                    "world_downloads",
+                    lambda data: files_from_nodes(parse_nested_list(data)),
+                    required=False,
+                    default=[],
                 ),
-                required=False,
-            ),
-            SchemaItem(
-                ["Figures"], "figures", figures_parse(), required=False, default=[]
-            ),
-        ],
+                SchemaItem(
+                    ["Image", "Images"],
+                    "images",
+                    lambda data: files_from_nodes(parse_nested_list(data)),
+                ),
+            ],
+        ),
+    ),
+    SchemaItem(
+        ["Description"],
+        "description",
+        parse_nested_list,
+    ),
+    SchemaItem(
+        ["Positives"],
+        "positives",
+        parse_nested_list,
+        required=False,
+        default=[],
+    ),
+    SchemaItem(
+        ["Negatives"],
+        "negatives",
+        parse_nested_list,
+        required=False,
+        default=[],
+    ),
+    SchemaItem(
+        ["Design Specifications"],
+        "design_specifications",
+        parse_nested_list,
+        required=False,
+        default=[],
+    ),
+    SchemaItem(
+        ["Instructions"],
+        "instructions",
+        schema_dict_parse(
+            heading_dict_parse(3),
+            [
+                SchemaItem(
+                    ["Notes"],
+                    "notes",
+                    parse_nested_list,
+                    required=False,
+                    default=[],
+                ),
+                SchemaItem(
+                    ["Build"],
+                    "build",
+                    parse_nested_list,
+                    required=False,
+                    default=[],
+                ),
+                SchemaItem(
+                    ["How to Use", "How to use", "Usage"],
+                    "usage",
+                    parse_nested_list,
+                    required=False,
+                    default=[],
+                ),
+            ],
+        ),
+        required=False,
+    ),
+    SchemaItem(["Figures"], "figures", figures_parse(), required=False, default=[]),
+]
+
+message_parse_schema = dict_postprocess_parse(
+    heading_dict_parse(1),
+    schema_dict_parse(heading_dict_parse(2), MESSAGE_SCHEMA, top_level=True),
+)
+# Same schema with every field parser timed, used while a ParseProfile is set
+profiled_message_parse_schema = dict_postprocess_parse(
+    heading_dict_parse(1),
+    schema_dict_parse(
+        heading_dict_parse(2), MESSAGE_SCHEMA, top_level=True, profiled=True
     ),
 )
 
 
-def message_parse(data: section) -> Message:
+def message_parse(data: section, fields: Iterable[str] | None = None) -> Message:
+    # fields limits which top level fields are parsed and returned, the post structure is still validated
+    if fields is not None:
+        fields = frozenset(fields)
+        if unknown := fields - MESSAGE_FIELDS:
+            raise ValueError(f"Unknown message fields: {', '.join(sorted(unknown))}")
+
     if data and any(line.strip().endswith("Original Post") for line in data[:2]):
         raise ValueError("Crosspost")
 
-    parsed = message_parse_schema(data)
+    schema = (
+        message_parse_schema
+        if PARSE_PROFILE.get() is None
+        else profiled_message_parse_schema
+    )
+    selection_token = FIELD_SELECTION.set(fields)
+    try:
+        parsed = schema(data)
+    finally:
+        FIELD_SELECTION.reset(selection_token)
 
     if len(parsed) != 1:
-        raise ValueError("Multiple variants in post")
+        error = ParseError("Multiple variants in post")
+        if not parsed:
+            raise error
+        collect_or_raise(error)
 
     return next(iter(parsed.values()))
 
 
-if __name__ == "__main__":
-    metadata_map = {
-        "channel_id": "channel_id",
-        "id": "thread_id",
-        "slug": "",
-        "title": "thread_name",
-        "author": "author_id",
-        "author_name": "author_name",
-        "created_at": "created_at",
-        "tags": "tags",
-    }
+def message_validate(data: section) -> list[ParseError]:
+    """Parses the whole post, returning every problem found instead of stopping at the first."""
+    errors: list[ParseError] = []
+    collector_token = ERROR_COLLECTOR.set(errors)
+    try:
+        message_parse(data)
+    except ParseError as e:
+        errors.append(e)
+    except Exception as e:
+        # Not recoverable, such as crossposts
+        error = ParseError(str(e), kind=type(e).__name__)
+        error.__cause__ = e
+        errors.append(error)
+    finally:
+        ERROR_COLLECTOR.reset(collector_token)
+    # In post order, so they can be fixed top to bottom
+    errors.sort(key=lambda error: error.span or (0, 0))
+    return errors
 
-    whitelisted_channels = {
-        # Monsters
-        1374185936564256768,  # overworld-monsters
-        1310484985546805319,  # slime
-        1374189324626821141,  # nether-monsters
-        1262787177432092783,  # gold-and-barter
-        1311841461029044326,  # fortress-monsters
-        1374193787437322322,  # end-monsters
-        # Creatures
-        1162390388976394240,  # villagers
-        1162119562922315856,  # iron
-        1374195641374347344,  # animals
-        1374197188791631883,  # bees
-        1374199361751482470,  # aquatic-creatures
-        # Agriculture
-        1366955484401242192,  # trees-and-leaves
-        1375250019216523264,  # mushrooms-and-fungi
-        1358146379708370984,  # moss-and-aquatic-plants
-        1358146101353381978,  # tall-plants
-        1358145991169147133,  # crops
-        1358146247680327902,  # flowers-and-grasses
-        # Blocks & Items
-        1376314653788868669,  # stone
-        1376642039256711329,  # gravity-blocks
-        1374233269171916841,  # block-converters
-        1374233112841682974,  # obsidian-and-lava
-        1374233064384757800,  # snow-and-ice
-        1374233292332732498,  # item-dupers
-        1376632527703375973,  # dirts
-        # Item Processing
-        1378800846250184944,  # storage-systems
-        1379588677948408012,  # furnace-arrays
-        1379704764471967785,  # potion-brewers
-        1266037379920167073,  # crafting
-        # Infrastructure
-        1383836451980050442,  # chunk-loading
-        1431068303228669952,  # mob-switches
-        1386442783338004501,  # infrastructure
-        1386748149531541698,  # terrain-clearing
-        1431451350826487940,  # entity-transport
-    }
 
-    failed: Counter[str] = Counter()
-    authors: Counter[str] = Counter()
+@dataclass
+class ParseOutcome:
+    result: Message | None
+    error: Exception | None
+    issues: list[ParseError]  # Every problem in the post when the parse failed
+    section_cache: dict[str, SectionRecord]
+    serialized: str | None  # document with the result under result_key, as JSON
+    profile: ParseProfile | None = None  # Timings of this post, when profiled
+
+
+def parse_post_job(
+    data: list[str],
+    username_lookup: dict[int, str],
+    section_cache: dict[str, SectionRecord],
+    document: dict | None = None,
+    result_key: str = "post_data",
+    indent: int | None = 4,
+    profile_label: str | None = None,
+) -> ParseOutcome:
+    """Parses and serializes one post with its own context, so it can run in a worker process.
+
+    With a profile_label the parse is profiled, the post's timings come back in
+    the outcome under that label for the caller to merge.
+    """
+    profile = ParseProfile() if profile_label is not None else None
+    lookup_token = set_contributor_username_lookup(username_lookup)
+    section_token = set_section_cache(section_cache)
+    try:
+        profile_token = set_parse_profile(profile)
+        start = time.perf_counter_ns()
+        try:
+            result = message_parse(data)
+        except Exception as e:
+            error = e
+        else:
+            error = None
+        finally:
+            if profile is not None:
+                profile.record_post(profile_label, time.perf_counter_ns() - start)
+            reset_parse_profile(profile_token)
+        # Validated outside the profile, only the failed parse itself is timed
+        if error is not None:
+            issues = message_validate(data)
+            return ParseOutcome(None, error, issues, section_cache, None, profile)
+    finally:
+        reset_section_cache(section_token)
+        reset_contributor_username_lookup(lookup_token)
+
+    serialized = None
+    if document is not None:
+        document[result_key] = result
+        separators = None if indent is not None else (",", ":")
+        serialized = json.dumps(
+            document, indent=indent, separators=separators, default=json_default
+        )
+    return ParseOutcome(result, None, [], section_cache, serialized, profile)
+
+
+ARCHIVE_METADATA_MAP = {
+    "channel_id": "channel_id",
+    "id": "thread_id",
+    "slug": "",
+    "title": "thread_name",
+    "author": "author_id",
+    "author_name": "author_name",
+    "created_at": "created_at",
+    "tags": "tags",
+}
+
+ARCHIVE_WHITELISTED_CHANNELS = {
+    # Monsters
+    1374185936564256768,  # overworld-monsters
+    1310484985546805319,  # slime
+    1374189324626821141,  # nether-monsters
+    1262787177432092783,  # gold-and-barter
+    1311841461029044326,  # fortress-monsters
+    1374193787437322322,  # end-monsters
+    # Creatures
+    1162390388976394240,  # villagers
+    1162119562922315856,  # iron
+    1374195641374347344,  # animals
+    1374197188791631883,  # bees
+    1374199361751482470,  # aquatic-creatures
+    # Agriculture
+    1366955484401242192,  # trees-and-leaves
+    1375250019216523264,  # mushrooms-and-fungi
+    1358146379708370984,  # moss-and-aquatic-plants
+    1358146101353381978,  # tall-plants
+    1358145991169147133,  # crops
+    1358146247680327902,  # flowers-and-grasses
+    # Blocks & Items
+    1376314653788868669,  # stone
+    1376642039256711329,  # gravity-blocks
+    1374233269171916841,  # block-converters
+    1374233112841682974,  # obsidian-and-lava
+    1374233064384757800,  # snow-and-ice
+    1374233292332732498,  # item-dupers
+    1376632527703375973,  # dirts
+    # Item Processing
+    1378800846250184944,  # storage-systems
+    1379588677948408012,  # furnace-arrays
+    1379704764471967785,  # potion-brewers
+    1266037379920167073,  # crafting
+    # Infrastructure
+    1383836451980050442,  # chunk-loading
+    1431068303228669952,  # mob-switches
+    1386442783338004501,  # infrastructure
+    1386748149531541698,  # terrain-clearing
+    1431451350826487940,  # entity-transport
+}
+
+ARCHIVE_GUILD_URL = "https://discord.com/channels/1161803566265143306"
+
+# (printed line, author key, channel key) for a post that failed to decode
+type decode_failure = tuple[str, str, str]
+
+
+def decode_entry(
+    entry: dict[str, str | int | section],
+) -> tuple[dict | None, decode_failure | None]:
+    channel_id = int(entry["channel_id"])
+    if channel_id not in ARCHIVE_WHITELISTED_CHANNELS:
+        return None, None
+
+    result = {k: entry.get(v, None) for k, v in ARCHIVE_METADATA_MAP.items()}
+
+    try:
+        messages = entry["messages"]
+        if not messages:
+            raise ValueError("No messages")
+
+        # Crossposts
+        if messages[0].startswith("## Original Post"):
+            raise ValueError("Crosspost")
+
+        raw_text = "\n".join(messages)
+        parsed = message_parse(raw_text.split("\n"))
+
+        if not parsed:
+            raise ValueError("No parsable content")
+
+        # Merge parsed message content
+        result.update(parsed)
+        return result, None
+
+    except Exception as e:
+        return None, (
+            f"{entry['author_id']}, "
+            f"{ARCHIVE_GUILD_URL}/{entry['thread_id']}, "
+            f'"{error_kind(e)}: {e}"',
+            f"<@{entry['author_id']}>",
+            f"{ARCHIVE_GUILD_URL}/{channel_id}",
+        )
 
-    def decode_entry(entry: dict[str, str | int | section]) -> dict | None:
-        channel_id = int(entry["channel_id"])
-        if channel_id not in whitelisted_channels:
-            return None
 
-        result = {k: entry.get(v, None) for k, v in metadata_map.items()}
+def iter_json_array(file: TextIO, chunk_size: int = 1 << 16) -> Iterator:
+    # Yields the elements of a top level JSON array one at a time without decoding the whole document
+    decoder = json.JSONDecoder()
+    # JSON whitespace, str.isspace would also accept characters json.loads rejects
+    whitespace = " \t\n\r"
+    delimiters = ",]" + whitespace
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def skip_whitespace() -> bool:
+        # Advances past whitespace, reading more input as needed. False once the input is exhausted
+        nonlocal buffer, pos, eof
+        while True:
+            while pos < len(buffer) and buffer[pos] in whitespace:
+                pos += 1
+            if pos < len(buffer):
+                return True
+            if eof:
+                return False
+            buffer, pos = file.read(chunk_size), 0
+            eof = not buffer
+
+    def read_more():
+        # Keeps only the unread part of the buffer and appends the next chunk
+        nonlocal buffer, pos, eof
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+    if not skip_whitespace() or buffer[pos] != "[":
+        raise ValueError("Expected a JSON array.")
+    pos += 1
+
+    expect_element = True
+    after_comma = False
+    while True:
+        if not skip_whitespace():
+            raise ValueError("Unterminated JSON array.")
+        if buffer[pos] == "]":
+            if after_comma:
+                raise ValueError("Trailing comma in JSON array.")
+            pos += 1
+            break
+        if not expect_element:
+            if buffer[pos] != ",":
+                raise ValueError(
+                    f"Expected ',' or ']' in JSON array, got {buffer[pos]!r}."
+                )
+            pos += 1
+            expect_element = after_comma = True
+            continue
 
         try:
-            messages = entry["messages"]
-            if not messages:
-                raise ValueError("No messages")
+            element, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # The element runs past the end of the buffer
+            read_more()
+            continue
+        # A number cut short by the end of the buffer still decodes, as a shorter one
+        # ("-2.5e3" read as "-2." gives -2), so an element only counts once a delimiter follows it
+        if end == len(buffer) and not eof:
+            read_more()
+            continue
+        if end < len(buffer) and buffer[end] not in delimiters:
+            if eof:
+                raise ValueError(
+                    f"Expected ',' or ']' in JSON array, got {buffer[end]!r}."
+                )
+            read_more()
+            continue
+        yield element
+        pos = end
+        expect_element = after_comma = False
 
-            # Crossposts
-            if messages[0].startswith("## Original Post"):
-                raise ValueError("Crosspost")
+    if skip_whitespace():
+        raise ValueError(f"Extra data after JSON array: {buffer[pos]!r}.")
 
-            raw_text = "\n".join(messages)
-            parsed = message_parse(raw_text.split("\n"))
 
-            if not parsed:
-                raise ValueError("No parsable content")
+def iter_archive_entries(path: str) -> Iterator[dict[str, str | int | section]]:
+    # NDJSON (one entry per line) or a JSON array, streamed in both cases
+    with open(path, encoding="utf-8") as file:
+        if path.endswith((".ndjson", ".jsonl")):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from iter_json_array(file)
 
-            # Merge parsed message content
-            result.update(parsed[0])
-            return result
 
-        except Exception as e:
-            print(
-                f"{entry['author_id']}, "
-                f"https://discord.com/channels/1161803566265143306/{entry['thread_id']}, "
-                f'"{type(e).__name__}: {e}"'
+def bounded_map[T, U](
+    executor: Executor, function: Callable[[T], U], items: Iterable[T], window: int
+) -> Iterator[U]:
+    # Like Executor.map, but only keeps window tasks in flight so the input is consumed lazily
+    pending: deque[Future[U]] = deque()
+    for item in items:
+        pending.append(executor.submit(function, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def decode_chunk(
+    entries: tuple[dict[str, str | int | section], ...],
+) -> list[tuple[dict | None, decode_failure | None]]:
+    # Unit of work for the process pool, chunked to amortise pickling overhead
+    return [decode_entry(entry) for entry in entries]
+
+
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(
+        description="Parse the archive backup into one JSON file per post."
+    )
+    argument_parser.add_argument(
+        "--input",
+        default="data/archive_backup.json",
+        help="Archive backup, a JSON array or NDJSON (.ndjson/.jsonl) file (default: data/archive_backup.json)",
+    )
+    argument_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes to parse with (default: 1, serial)",
+    )
+    argument_parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=64,
+        help="Entries sent to a worker at a time (default: 64)",
+    )
+    argument_parser.add_argument(
+        "--output",
+        default="data/out",
+        help="Output directory (default: data/out)",
+    )
+    argument_parser.add_argument(
+        "--output-format",
+        choices=OUTPUT_FORMATS,
+        default="files",
+        help="One <id>.json file per post, or compact sharded NDJSON with an offset "
+        "index, optionally gzipped (default: files)",
+    )
+    args = argument_parser.parse_args()
+
+    failed: Counter[str] = Counter()
+    authors: Counter[str] = Counter()
+
+    # Stream the archive so entries are parsed as they are read
+    data = iter_archive_entries(args.input)
+
+    store = (
+        None
+        if args.output_format == "files"
+        else ShardedStore.for_format(args.output, args.output_format)
+    )
+
+    # Process entries, results come back in input order in both modes
+    with (
+        ProcessPoolExecutor(max_workers=args.jobs) if args.jobs > 1 else nullcontext()
+    ) as executor:
+        if executor is None:
+            results = map(decode_entry, data)
+        else:
+            results = chain.from_iterable(
+                bounded_map(
+                    executor,
+                    decode_chunk,
+                    batched(data, args.chunk_size),
+                    window=args.jobs * 2,
+                )
             )
-            authors[f"<@{entry['author_id']}>"] += 1
-            failed[
-                f"https://discord.com/channels/1161803566265143306/{channel_id}"
-            ] += 1
-            return None
 
-    # Load Archive
-    with open("data/archive_backup.json", encoding="utf-8") as file:
-        data = json.load(file)
+        for result, failure in results:
+            if failure is not None:
+                line, author, channel = failure
+                print(line)
+                authors[author] += 1
+                failed[channel] += 1
+                continue
+            if result is None:
+                continue
 
-    # Process entries
-    for entry in data:
-        result = decode_entry(entry)
-        if result is None:
-            continue
+            if store is not None:
+                compact = json.dumps(
+                    result, separators=(",", ":"), default=json_default
+                )
+                store.put_text(result["id"], compact)
+                continue
+            out_path = f"{args.output}/{result['id']}.json"
+            with open(out_path, "w", encoding="utf-8") as file:
+                json.dump(result, file, indent=4, default=json_default)
 
-        out_path = f"data/out/{result['id']}.json"
-        with open(out_path, "w", encoding="utf-8") as file:
-            json.dump(result, file, indent=4)
+    if store is not None:
+        store.close()
 
     # Summary
     print(f"Failed posts: {failed.total()}")
@@ -0,0 +1,341 @@
+import argparse
+import json
+import platform
+import random
+import statistics
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable
+
+from parser import (
+    MESSAGE_SCHEMA,
+    contributors_parse,
+    figures_parse,
+    files_from_nodes,
+    heading_dict_parse,
+    message_parse,
+    parse_nested_list,
+    parse_rate_line,
+    reset_contributor_username_lookup,
+    set_contributor_username_lookup,
+    walk_lag,
+)
+
+# Benchmarks message_parse on a synthetic corpus shaped like MessageDict.Message,
+# parse_nested_list on its own on long and deeply nested lists, and every group of
+# grammar patterns through the function that matches with it.
+# The corpus only depends on the knobs and the seed, so runs on different commits
+# parse exactly the same posts and their JSON reports can be compared directly.
+
+
+@dataclass(frozen=True)
+class CorpusConfig:
+    posts: int = 300
+    seed: int = 1
+    variants: int = 3  # Rate variant groups per post
+    depth: int = 3  # Nesting depth of rate variants and text lists
+    rates: int = 4  # Rate lines per variant group
+    contributors: int = 3  # Designers per post, credits get half as many
+    files: int = 4  # Files per folder in the schematic tree, with as many folders
+    list_items: int = 2000  # Items of the standalone parse_nested_list cases
+    list_depth: int = 200  # Nesting depth of the deep parse_nested_list case
+    pattern_lines: int = 3000  # Lines per grammar pattern case
+
+
+def text_list(
+    r: random.Random, depth: int, width: int = 2, level: int = 0
+) -> list[str]:
+    lines = []
+    for i in range(width):
+        marker = "- " if r.random() < 0.7 else f"{i + 1}. "
+        lines.append(f"{'  ' * level}{marker}Line {level}.{i} about the design")
+        if level + 1 < depth:
+            lines.extend(text_list(r, depth, width, level + 1))
+    return lines
+
+
+def rate_lines(r: random.Random, config: CorpusConfig, level: int) -> list[str]:
+    indent = "  " * level
+    lines = []
+    for i in range(config.rates):
+        items = r.choice(["Iron Ingot", "Poppy, Iron Ingot", "String / Bone"])
+        amount = f"{r.randint(1, 999)}.{r.randint(0, 9)}{r.choice(['', 'k', 'm'])}"
+        lines.append(f"{indent}- (1.2{i % 2}) {items} (afk): {amount}/h (note {i})")
+    return lines
+
+
+def rate_variants(r: random.Random, config: CorpusConfig, level: int) -> list[str]:
+    lines = []
+    for v in range(config.variants):
+        lines.append(f"{'  ' * level}- Variant {level}.{v}:")
+        if level + 1 < config.depth:
+            lines.extend(rate_variants(r, config, level + 1))
+        else:
+            lines.extend(rate_lines(r, config, level + 1))
+    return lines
+
+
+def contributor_lines(r: random.Random, count: int) -> list[str]:
+    lines = []
+    for i in range(count):
+        user_id = r.randint(10**17, 10**18)
+        lines.append(
+            f"- <@{user_id}>, [Name{i}](<https://cdn.discordapp.com/c/{i}>): "
+            f"[redstone](<https://media.discordapp.net/a/{i}.png>), layout"
+        )
+    return lines
+
+
+def file_tree(config: CorpusConfig) -> list[str]:
+    lines = ["- Schematics:", "  - Main: https://cdn.discordapp.com/a/1/farm.litematic"]
+    for folder in range(config.files):
+        lines.append(f"  - Folder {folder}:")
+        lines.extend(
+            f"    - https://cdn.discordapp.com/a/{folder}/{i}.litematic"
+            for i in range(config.files)
+        )
+    lines += ["- World Download: https://cdn.discordapp.com/a/w.zip", "- Images:"]
+    lines.append("  - https://media.discordapp.net/a/img.png")
+    return lines
+
+
+def generate_post(r: random.Random, config: CorpusConfig) -> list[str]:
+    lines = ["# Example Farm", "## Designers"]
+    lines += contributor_lines(r, config.contributors)
+    lines += ["## Credits"] + contributor_lines(r, max(config.contributors // 2, 1))
+    lines += ["## Versions", "- 1.17+; 1.21 (with modifications)"]
+    lines += ["## Rates"] + rate_variants(r, config, 0)
+    lines += ["- Gunpowder: 3m/h", "### Consumes", "- Fuel: 1/h", "### Notes"]
+    lines += text_list(r, config.depth)
+    lines += [
+        "## Lag Info",
+        "- Test environment: CPU Ryzen 5 with Lithium in 1.21 using Variant 0",
+        "- Idle: 0.5mspt",
+        "- Active:",
+        "  - Variant A: 2.3mspt",
+        "  - Sub:",
+        "    - 1.5 mspt",
+    ]
+    lines += ["## Video Links", "- [Showcase](<https://youtu.be/abc>)"]
+    lines += ["## Files"] + file_tree(config)
+    lines += ["## Description"] + text_list(r, config.depth)
+    for field in ("Positives", "Negatives", "Design Specifications"):
+        lines += [f"## {field}"] + text_list(r, config.depth)
+    lines += ["## Instructions", "### Build"] + text_list(r, config.depth)
+    lines += ["### How to use"] + text_list(r, config.depth)
+    lines += ["## Figures", "- fig https://cdn.discordapp.com/a/f.png"]
+    return lines
+
+
+def stepped_list(items: int, depth: int) -> list[str]:
+    # Each item one level deeper than the last, back to the top every depth items
+    return [f"{'  ' * (i % depth)}- Item {i} about the design" for i in range(items)]
+
+
+def pattern_cases(
+    r: random.Random, config: CorpusConfig
+) -> dict[str, Callable[[], object]]:
+    # Inputs are built up front, only the matching is timed
+    count = config.pattern_lines
+    valid_rates = rate_lines(r, CorpusConfig(rates=count), 0)
+    # Variant headings and notes, the lines the literal checks turn away
+    invalid_rates = [f"Variant {i} with notes" for i in range(count)]
+    lag_lines = []
+    for i in range(count // 4):
+        lag_lines += [f"- Variant {i}:", f"  - Sub {i}: 2.{i}mspt"]
+        lag_lines += [f"  - {i}.5 mspt", "  - Not measured yet"]
+    lag_nodes = parse_nested_list(lag_lines)
+    file_lines = []
+    for i in range(count // 2):
+        file_lines.append(f"- https://cdn.discordapp.com/a/{i}/farm.litematic (v{i})")
+        file_lines.append(f"- Folder {i} without a link")
+    file_nodes = parse_nested_list(file_lines)
+    contributors = contributor_lines(r, count)
+    figures = [
+        f"- Figure {i} https://cdn.discordapp.com/a/{i}.png" if i % 2 else "- Caption"
+        for i in range(count)
+    ]
+    contributors_parser, figures_parser = contributors_parse(), figures_parse()
+
+    def parse_rates(lines: list[str]):
+        for line in lines:
+            try:
+                parse_rate_line(line)
+            except ValueError:
+                pass
+
+    return {
+        "rate_line_valid": lambda: parse_rates(valid_rates),
+        "rate_line_invalid": lambda: parse_rates(invalid_rates),
+        "lag": lambda: walk_lag(lag_nodes, (), []),
+        "file_urls": lambda: files_from_nodes(file_nodes),
+        "contributors": lambda: [contributors_parser([line]) for line in contributors],
+        "figure_urls": lambda: figures_parser(figures),
+    }
+
+
+def time_calls(function: Callable[[], object], repeats: int) -> dict[str, float]:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter_ns()
+        function()
+        times.append(time.perf_counter_ns() - start)
+    return summarize(times)
+
+
+def generate_corpus(config: CorpusConfig) -> list[list[str]]:
+    r = random.Random(config.seed)
+    return [generate_post(r, config) for _ in range(config.posts)]
+
+
+def username_lookup(corpus: list[list[str]]) -> dict[int, str]:
+    # Every mentioned designer resolves, as it would with a warm username cache
+    lookup = {}
+    for lines in corpus:
+        for line in lines:
+            if line.startswith("- <@"):
+                user_id = int(line[4 : line.index(">")])
+                lookup[user_id] = f"User{user_id % 1000}"
+    return lookup
+
+
+def field_sections(lines: list[str]) -> dict[str, list[str]]:
+    # Field name -> section lines, split the same way message_parse does
+    (variant,) = heading_dict_parse(1)(lines).values()
+    sections = heading_dict_parse(2)(variant)
+    result = {}
+    for field in MESSAGE_SCHEMA:
+        for display_name in field.display_names:
+            if display_name in sections:
+                result[field.name] = sections[display_name]
+                break
+    return result
+
+
+def summarize(per_post_ns: list[float]) -> dict[str, float]:
+    # Per post times of every repeat, min is the least noisy for comparisons
+    return {
+        "min_us": round(min(per_post_ns) / 1e3, 3),
+        "median_us": round(statistics.median(per_post_ns) / 1e3, 3),
+        "stdev_us": round(statistics.pstdev(per_post_ns) / 1e3, 3),
+    }
+
+
+def run(config: CorpusConfig, repeats: int) -> dict:
+    corpus = generate_corpus(config)
+    sections = [field_sections(lines) for lines in corpus]
+    parsers = {field.name: field.parser for field in MESSAGE_SCHEMA}
+    token = set_contributor_username_lookup(username_lookup(corpus))
+    try:
+        # Validates the corpus before anything is timed
+        for lines in corpus:
+            message_parse(lines)
+
+        end_to_end = []
+        for _ in range(repeats):
+            start = time.perf_counter_ns()
+            for lines in corpus:
+                message_parse(lines)
+            end_to_end.append((time.perf_counter_ns() - start) / len(corpus))
+
+        fields = {}
+        for name, field_parser in parsers.items():
+            field_data = [post[name] for post in sections if name in post]
+            if not field_data:
+                continue
+            times = []
+            for _ in range(repeats):
+                start = time.perf_counter_ns()
+                for data in field_data:
+                    field_parser(data)
+                times.append((time.perf_counter_ns() - start) / len(corpus))
+            fields[name] = summarize(times)
+
+        # Every schema field except versions goes through parse_nested_list
+        nested_lists = {}
+        cases = {
+            "long": stepped_list(config.list_items, 5),
+            "deep": stepped_list(config.list_items, config.list_depth),
+        }
+        for name, lines in cases.items():
+            nested_lists[name] = time_calls(lambda: parse_nested_list(lines), repeats)
+
+        # Whole case per call, pattern_lines lines each
+        patterns = {
+            name: time_calls(case, repeats)
+            for name, case in pattern_cases(random.Random(config.seed), config).items()
+        }
+    finally:
+        reset_contributor_username_lookup(token)
+
+    return {
+        "config": asdict(config),
+        "repeats": repeats,
+        "lines_per_post": round(sum(map(len, corpus)) / len(corpus), 1),
+        "python": platform.python_version(),
+        "message_parse": summarize(end_to_end),
+        "fields": fields,
+        "parse_nested_list": nested_lists,
+        "patterns": patterns,
+    }
+
+
+def compare(report: dict, baseline: dict) -> list[str]:
+    # Ratio of min times against a previous report, below 1.0 is faster
+    lines = []
+    if report["config"] != baseline["config"]:
+        lines.append("Warning: corpus configs differ, ratios are not comparable")
+    pairs = [("message_parse", report["message_parse"], baseline["message_parse"])]
+    pairs += [
+        (f"fields.{name}", stats, baseline["fields"][name])
+        for name, stats in report["fields"].items()
+        if name in baseline["fields"]
+    ]
+    for group in ("parse_nested_list", "patterns"):
+        pairs += [
+            (f"{group}.{name}", stats, baseline[group][name])
+            for name, stats in report[group].items()
+            if name in baseline.get(group, {})
+        ]
+    for name, stats, base in pairs:
+        ratio = stats["min_us"] / base["min_us"] if base["min_us"] else float("nan")
+        lines.append(
+            f"{name}: {base['min_us']}us -> {stats['min_us']}us ({ratio:.2f}x)"
+        )
+    return lines
+
+
+if __name__ == "__main__":
+    defaults = CorpusConfig()
+    argument_parser = argparse.ArgumentParser(
+        description="Benchmark message_parse and its field parsers on synthetic posts."
+    )
+    for name, value in asdict(defaults).items():
+        argument_parser.add_argument(
+            f"--{name}", type=int, default=value, help=f"(default: {value})"
+        )
+    argument_parser.add_argument(
+        "--repeats", type=int, default=10, help="Timed passes (default: 10)"
+    )
+    argument_parser.add_argument(
+        "--output", help="Write the JSON report here instead of stdout"
+    )
+    argument_parser.add_argument(
+        "--compare", help="Previous JSON report to print speed ratios against"
+    )
+    args = argument_parser.parse_args()
+
+    config = CorpusConfig(**{name: getattr(args, name) for name in asdict(defaults)})
+    report = run(config, args.repeats)
+
+    # Sorted keys and fixed rounding keep reports diffable between commits
+    report_json = json.dumps(report, indent=4, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(report_json + "\n")
+    else:
+        print(report_json)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            print("\n".join(compare(report, json.load(file))))
@@ -0,0 +1,86 @@
+import io
+import json
+import random
+
+import pytest
+
+from parser import iter_json_array
+
+CHUNK_SIZES = (1, 2, 3, 5, 64)
+
+
+def random_value(r: random.Random, depth: int = 0) -> object:
+    kind = r.randrange(8 if depth < 3 else 5)
+    if kind == 0:
+        return r.randint(-(10**12), 10**12)
+    if kind == 1:
+        return r.uniform(-1e6, 1e6) * 10 ** r.randint(-30, 30)
+    if kind == 2:
+        return r.choice([True, False, None])
+    if kind == 3:
+        return "".join(r.choice('ab c"\\\né☃') for _ in range(r.randrange(6)))
+    if kind == 4:
+        return r.randint(-9, 9)
+    if kind == 5:
+        return [random_value(r, depth + 1) for _ in range(r.randrange(4))]
+    return {f"k{i}": random_value(r, depth + 1) for i in range(r.randrange(4))}
+
+
+def random_document(r: random.Random) -> str:
+    values = [random_value(r) for _ in range(r.randrange(6))]
+    separator = r.choice([",", ", ", " ,\n", "\t,\r\n"])
+    padding = r.choice(["", " ", "\n", " \t\r\n"])
+    return f"{padding}[{padding}{separator.join(map(json.dumps, values))}{padding}]{padding}"
+
+
+def mutate(r: random.Random, document: str) -> str:
+    # Single character edits, most make the document invalid
+    i = r.randrange(len(document) + 1)
+    edit = r.randrange(3)
+    if edit == 0:
+        return document[:i] + r.choice('[]{},:."-+e0x \x0b') + document[i:]
+    if edit == 1:
+        return document[:i] + document[i + 1 :]
+    return document[:i] + r.choice("]1,") + document[i + 1 :]
+
+
+def read_all(document: str, chunk_size: int) -> list:
+    return list(iter_json_array(io.StringIO(document), chunk_size))
+
+
+def loads_array(document: str) -> list:
+    value = json.loads(document)
+    if not isinstance(value, list):
+        raise ValueError("Not an array")
+    return value
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_matches_json_loads(chunk_size):
+    r = random.Random(chunk_size)
+    for _ in range(3000):
+        document = random_document(r)
+        if r.random() < 0.5:
+            document = mutate(r, document)
+        try:
+            expected = loads_array(document)
+        except ValueError:
+            with pytest.raises(ValueError):
+                read_all(document, chunk_size)
+            continue
+        assert read_all(document, chunk_size) == expected, document
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize(
+    "document",
+    ["[-25000000000.5e-3]", "[1.25, 3e10, -0.0]", "[true,false,null]", " [ ] "],
+)
+def test_numbers_split_at_chunk_boundaries(document, chunk_size):
+    assert read_all(document, chunk_size) == json.loads(document)
+
+
+@pytest.mark.parametrize("document", ["[1,]", "[1]x", "[1 2]", "[1", "[,1]", "1"])
+def test_rejects_invalid_arrays(document):
+    with pytest.raises(ValueError):
+        read_all(document, 2)
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+import pytest
+
+from cogs.parser_functions import ParseCache
+
+
+def make_thread(name="Some design", tags=(1, 2), last_message_id=10):
+    return SimpleNamespace(
+        id=1234,
+        name=name,
+        applied_tags=[SimpleNamespace(id=tag) for tag in tags],
+        last_message_id=last_message_id,
+    )
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ParseCache(str(tmp_path / "parse_cache.json"))
+    cache.update(make_thread(), "hash")
+    return cache
+
+
+def test_new_messages_with_same_content_are_unchanged(cache):
+    thread = make_thread(last_message_id=11)
+    assert not cache.is_fresh(thread, True)
+    assert cache.is_unchanged(thread, "hash", True)
+
+
+@pytest.mark.parametrize(
+    "thread",
+    [
+        make_thread(name="Renamed design"),
+        make_thread(tags=(1, 3)),
+        make_thread(name="Renamed design", tags=(2,), last_message_id=11),
+    ],
+)
+def test_rename_or_retag_is_not_unchanged(cache, thread):
+    assert not cache.is_fresh(thread, True)
+    assert not cache.is_unchanged(thread, "hash", True)
+
+
+def test_changed_content_or_missing_output_is_not_unchanged(cache):
+    assert not cache.is_unchanged(make_thread(), "other", True)
+    assert not cache.is_unchanged(make_thread(), "hash", False)
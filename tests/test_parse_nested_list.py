@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+from parser import LIST_ITEM_RE, ListNode, parse_nested_list
+
+
+def reference_parse_nested_list(data: list[str], indent: int = 0) -> list[ListNode]:
+    # The recursive implementation the stack-based one replaced, kept as the spec
+    nodes: list[ListNode] = []
+    i = 0
+
+    while i < len(data):
+        line = data[i]
+        stripped = line.lstrip()
+        current_indent = len(line) - len(stripped)
+
+        if current_indent < indent:
+            i += 1
+            continue
+
+        m = LIST_ITEM_RE.match(stripped)
+        if not m:
+            i += 1
+            continue
+
+        prefix = m.group("prefix")
+        text = m.group("text").strip()
+
+        list_type = "dashed" if prefix == "- " else "numbered"
+
+        i += 1
+
+        # collect children
+        children_lines = []
+        while i < len(data):
+            next_line = data[i]
+            next_stripped = next_line.lstrip()
+            next_indent = len(next_line) - len(next_stripped)
+
+            if next_indent <= current_indent:
+                break
+
+            children_lines.append(next_line)
+            i += 1
+
+        nodes.append(
+            ListNode(
+                text=text,
+                list_type=list_type,
+                children=reference_parse_nested_list(
+                    children_lines, current_indent + 2
+                ),
+            )
+        )
+
+    return nodes
+
+
+def random_lines(r: random.Random, count: int, max_indent: int) -> list[str]:
+    lines = []
+    for i in range(count):
+        indent = r.choice([" ", "\t"]) * r.randrange(max_indent + 1)
+        body = r.choice(
+            [f"- item {i}", f"{i}. item", f"-  spaced {i} ", "-", "text", "", "1.5"]
+        )
+        lines.append(indent + body)
+    return lines
+
+
+def stepped_lines(count: int, depth: int) -> list[str]:
+    # Items nested one level deeper each line, back to the top every depth lines
+    return [f"{'  ' * (i % depth)}- Item {i}" for i in range(count)]
+
+
+@pytest.mark.parametrize("indent", [0, 1, 2, 4])
+def test_matches_reference_on_random_lines(indent):
+    r = random.Random(indent)
+    for _ in range(2000):
+        lines = random_lines(r, r.randrange(30), r.randrange(1, 12))
+        expected = reference_parse_nested_list(lines, indent)
+        assert parse_nested_list(lines, indent) == expected, lines
+
+
+@pytest.mark.parametrize("count, depth", [(2000, 5), (500, 40), (400, 200)])
+def test_matches_reference_on_deep_and_long_lists(count, depth):
+    lines = stepped_lines(count, depth)
+    assert parse_nested_list(lines) == reference_parse_nested_list(lines)
+
+
+def test_deep_list_nests_every_level():
+    nodes = parse_nested_list(stepped_lines(300, 300))
+    depth = 0
+    while nodes:
+        (node,) = nodes
+        nodes = node.children
+        depth += 1
+    assert depth == 300